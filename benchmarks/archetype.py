@@ -0,0 +1,150 @@
+"""
+Builds a synthetic archetype to benchmark generoo against.
+
+The archetype has a configurable number of files spread over a directory tree of a given depth. Files are filled with
+text of a given size in which a given fraction of the lines carries a Mustache tag, and a given fraction of the
+directories is conditional on a `{{#flag}}` section, so every shape of template tree can be reproduced from a handful of
+numbers. The same parameters and seed always build the same archetype.
+
+The template configuration prompts for a name with transformations, a boolean flag with a follow up and a number with
+validations; answers() returns the input that answers them.
+
+Usage: python benchmarks/archetype.py DIRECTORY [--files 200] [--depth 3] [--size 2048] [--tag-density 0.2]
+       [--conditional-density 0.1] [--seed 0]
+"""
+import argparse
+import json
+import os
+import random
+
+config_filename = 'project-template-config.json'
+template_configuration = {
+    'variables': [
+        {'name': 'generator', 'value': 'benchmark'},
+    ],
+    'prompts': [
+        {
+            'name': 'name',
+            'text': 'Enter the project name',
+            'default': 'benchmark-project',
+            'validations': [{'evaluation': 'REGEX', 'value': '^[a-z][a-z0-9-]*$'}],
+            'transformations': [
+                {'name': 'name_snake', 'transformation': 'SNAKE'},
+                {'name': 'name_camel', 'transformation': 'CAMEL'},
+                {'name': 'name_capitalized', 'transformation': 'CAPITALIZED'},
+                {'name': 'name_periods', 'transformation': 'PERIODS'},
+            ],
+        },
+        {
+            'name': 'flag',
+            'text': 'Include the conditional directories?',
+            'type': 'BOOL',
+            'default': 'y',
+            'follow_ups': [
+                {
+                    'name': 'flag_detail',
+                    'text': 'Enter a detail for the conditional directories',
+                    'default': 'detail',
+                    'conditions': [{'evaluation': 'BOOL', 'value': True}],
+                },
+            ],
+        },
+        {
+            'name': 'count',
+            'text': 'Enter a count',
+            'default': '5',
+            'validations': [
+                {'evaluation': 'GREATER_THAN', 'value': 0},
+                {'evaluation': 'LESS_THAN', 'value': 100},
+            ],
+        },
+    ],
+}
+tags = ['{{name}}', '{{name_snake}}', '{{name_camel}}', '{{name_capitalized}}', '{{name_periods}}', '{{count}}',
+        '{{generator}}', '{{#flag}}{{flag_detail}}{{/flag}}']
+words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod',
+         'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua']
+
+
+def answers(flag: bool = True) -> str:
+    """The input answering every prompt of the synthetic template configuration."""
+    return 'benchmark-project\n' + ('y\ndetail\n' if flag else 'n\n') + '5\n'
+
+
+def build_archetype(directory: str, files: int = 200, depth: int = 3, size: int = 2048, tag_density: float = 0.2,
+                    conditional_density: float = 0.1, seed: int = 0) -> dict:
+    """
+    Writes the synthetic archetype and its template configuration to the directory.
+
+    :param directory:
+    :param files: number of template files.
+    :param depth: number of directory levels below the archetype root.
+    :param size: approximate size of every file in bytes.
+    :param tag_density: fraction of lines that carry a Mustache tag.
+    :param conditional_density: fraction of directories whose name is a {{#flag}} section.
+    :param seed:
+    :return: the parameters the archetype was built with.
+    """
+    generator = random.Random(seed)
+    # Every level has more directories than the one above it, so that the files spread out as the tree gets deeper.
+    levels = [['']]
+    for level in range(depth):
+        children = []
+        for index in range(max(1, round(files ** ((level + 1) / (depth + 1))))):
+            name = f'dir{level}_{index}'
+            if generator.random() < conditional_density:
+                name = '{{#flag}}' + name
+            elif generator.random() < 0.1:
+                name = name + '_{{name_snake}}'
+            children.append(os.path.join(generator.choice(levels[-1]), name))
+        levels.append(children)
+    directories = [directory for level in levels for directory in level]
+
+    for index in range(files):
+        parent = os.path.join(directory, generator.choice(directories))
+        os.makedirs(parent, exist_ok=True)
+        name = f'file{index}_{{{{name_camel}}}}.txt' if generator.random() < 0.1 else f'file{index}.txt'
+        with open(os.path.join(parent, name), 'w') as f:
+            f.write(build_content(generator, size, tag_density))
+
+    with open(os.path.join(directory, config_filename), 'w') as f:
+        json.dump(template_configuration, f, indent=2)
+    return {'files': files, 'depth': depth, 'size': size, 'tag_density': tag_density,
+            'conditional_density': conditional_density, 'seed': seed}
+
+
+def build_content(generator: random.Random, size: int, tag_density: float) -> str:
+    lines = []
+    written = 0
+    while written < size:
+        line = ' '.join(generator.choice(words) for _ in range(10))
+        if generator.random() < tag_density:
+            line = f'{line} {generator.choice(tags)}'
+        lines.append(line)
+        written += len(line) + 1
+    return '\n'.join(lines) + '\n'
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--files', type=int, default=200, help='Number of template files. Defaults to 200.')
+    parser.add_argument('--depth', type=int, default=3, help='Directory levels below the root. Defaults to 3.')
+    parser.add_argument('--size', type=int, default=2048, help='Approximate size of every file in bytes. Defaults to 2048.')
+    parser.add_argument('--tag-density', type=float, default=0.2,
+                        help='Fraction of lines that carry a Mustache tag. Defaults to 0.2.')
+    parser.add_argument('--conditional-density', type=float, default=0.1,
+                        help='Fraction of directories that are {{#flag}} sections. Defaults to 0.1.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random layout and content. Defaults to 0.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a synthetic archetype to benchmark generoo against.')
+    parser.add_argument('directory', help='The directory to build the archetype in.')
+    add_arguments(parser)
+    args = parser.parse_args()
+    parameters = build_archetype(args.directory, args.files, args.depth, args.size, args.tag_density,
+                                 args.conditional_density, args.seed)
+    print(json.dumps(parameters))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures how long generoo takes to start and fails when it goes over budget.
+
+The startup time is the median wall time of `python -m generoo --version` (and `--help`) minus the median wall time of
+an empty interpreter, so the budget does not depend on how fast the machine starts Python itself. It also checks that
+importing the CLI does not pull in any of the heavy dependencies, which are only imported once they are needed.
+
+Usage: python benchmarks/startup.py [--runs 20] [--budget-ms 60]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+heavy_modules = ['yaml', 'pick', 'curses', 'regex', 'pystache', 'concurrent.futures']
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(command: list, runs: int) -> float:
+    environment = dict(os.environ, PYTHONPATH=repository)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=environment, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def imported_heavy_modules() -> list:
+    environment = dict(os.environ, PYTHONPATH=repository)
+    script = f'import sys, generoo.generoo; print(" ".join(m for m in {heavy_modules!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, env=environment, check=True)
+    return output.stdout.decode().split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure generoo startup time against a budget.')
+    parser.add_argument('--runs', type=int, default=20, help='Runs per command. Defaults to 20.')
+    parser.add_argument('--budget-ms', type=float, default=60.0,
+                        help='Allowed startup time on top of the bare interpreter, in milliseconds. Defaults to 60.')
+    args = parser.parse_args()
+
+    interpreter = time_command([sys.executable, '-c', 'pass'], args.runs)
+    failed = False
+    for flag in ('--version', '--help'):
+        total = time_command([sys.executable, '-m', 'generoo', flag], args.runs)
+        overhead = (total - interpreter) * 1000
+        within_budget = overhead <= args.budget_ms
+        failed = failed or not within_budget
+        print(f'generoo {flag}: {total * 1000:.1f} ms, {overhead:.1f} ms over the interpreter '
+              f'({"ok" if within_budget else "over budget"}, budget {args.budget_ms:.0f} ms)')
+
+    heavy = imported_heavy_modules()
+    if heavy:
+        failed = True
+        print(f'Importing generoo.generoo loads heavy modules: {", ".join(heavy)}')
+    else:
+        print('Importing generoo.generoo loads no heavy modules.')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
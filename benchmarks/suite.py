@@ -0,0 +1,226 @@
+"""
+Times generoo end to end and its hot helpers against a synthetic archetype, and saves the results as JSON so that two
+runs can be compared.
+
+End to end benchmarks run generate_project in process with scripted answers to its prompts, both cold, with empty caches
+and a fresh process state, and warm, with the caches of the previous run. Microbenchmarks time the convert_to_* helpers,
+evaluate_filepath_conditions, collecting the jobs of the template directory, is_valid_input, and rendering templates and
+destination paths with the default render engine and with pystache's renderer, compiling a template for the compiled
+render engine, which it does the second time a template is rendered, and streaming a few megabytes of a template.
+
+Every result is the median of its repeats in seconds, per generation for end to end benchmarks and per call for
+microbenchmarks. --compare prints the change against an earlier results file and --threshold fails the run when any
+benchmark got slower by more than the given percentage.
+
+Usage: python benchmarks/suite.py [--output results.json] [--compare baseline.json] [--threshold 10]
+       [--repeat 5] [--filter convert] [archetype options, see archetype.py]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from contextlib import redirect_stdout
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from archetype import add_arguments, answers, build_archetype, config_filename  # noqa: E402
+from generoo import version  # noqa: E402
+from generoo import generoo as cli  # noqa: E402
+from generoo import utils  # noqa: E402
+from generoo.engines import compile_template  # noqa: E402
+from generoo.streaming import render_chunks  # noqa: E402
+from pystache import parse  # noqa: E402
+
+results_version = 1
+sample_words = ['tech.armyofone', 'example', 'ArmyOfOne', 'my-project_name', 'some value with spaces',
+                'HTTPServerConfig', 'a/b/c.d', 'x']
+
+
+def measure(function, repeat: int) -> list:
+    """Times the function with timeit, calling it often enough per repeat to take about 0.2 seconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+
+
+def reset_process_state(cache: str):
+    """Forgets everything generoo keeps in memory and points its caches at the given directory."""
+    os.environ['GENEROO_CACHE_DIR'] = cache
+    cli.template_trees.clear()
+    utils.clear_templates()
+    utils.template_scan.entries = None
+    utils.template_scan.modified = False
+    utils.template_scan.names_entries = None
+    utils.template_scan.names_modified = False
+    utils.plan_cache.entries = {}
+    utils.plan_cache.modified = set()
+    utils.source_cache.used = set()
+    utils.split_words.cache_clear()
+
+
+def generate(archetype: str, destination: str, jobs: int):
+    args = cli.build_parser().parse_args(['generate', 'project', destination, '-n', '-t', archetype + os.sep,
+                                          '-c', os.path.join(archetype, config_filename), '-j', str(jobs)])
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(answers())
+    try:
+        with redirect_stdout(io.StringIO()):
+            cli.run(args)
+    finally:
+        sys.stdin = stdin
+
+
+def end_to_end_benchmarks(archetype: str, work: str, repeat: int, jobs: int, selected) -> dict:
+    def generate_projects(label: str, cold: bool) -> list:
+        timings = []
+        for index in range(repeat):
+            if cold:
+                reset_process_state(os.path.join(work, f'cache-{label}-{index}'))
+            start = time.perf_counter()
+            generate(archetype, os.path.join(work, f'project-{label}-{index}'), jobs)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    timings = {}
+    if selected('generate_project_warm'):
+        reset_process_state(os.path.join(work, 'cache-warm'))
+        generate(archetype, os.path.join(work, 'project-warm-up'), jobs)
+        timings['generate_project_warm'] = generate_projects('warm', cold=False)
+    if selected('generate_project_cold'):
+        timings['generate_project_cold'] = generate_projects('cold', cold=True)
+    return timings
+
+
+def micro_benchmarks(archetype: str, repeat: int, selected) -> dict:
+    benchmarks = {}
+    for name in ('snake', 'dashes', 'periods', 'slashes', 'lower_with_spaces', 'camel', 'caps_with_spaces',
+                 'caps_no_spaces'):
+        convert = getattr(utils, f'convert_to_{name}')
+
+        def convert_words(convert=convert):
+            # Clearing the cache times the conversion itself rather than a dictionary lookup.
+            utils.split_words.cache_clear()
+            for word in sample_words:
+                convert(word)
+        benchmarks[f'convert_to_{name}'] = convert_words
+
+    run_configuration = {'name': 'benchmark-project', 'name_snake': 'benchmark_project', 'flag': True,
+                         'flag_detail': 'detail', 'count': '5', 'generator': 'benchmark', 'name_camel': 'benchmarkProject',
+                         'name_capitalized': 'BenchmarkProject', 'name_periods': 'benchmark.project'}
+    args = argparse.Namespace(name='project')
+    jobs = cli.collect_template_dir(args, archetype + os.sep, os.curdir, run_configuration)
+    destinations = [os.path.join(args.name, os.path.relpath(os.path.join(root, name), archetype))
+                    for root, _, files in os.walk(archetype) for name in files]
+    reported = [reported for _, _, reported in jobs]
+
+    def evaluate_conditions():
+        for destination in destinations:
+            cli.evaluate_filepath_conditions(destination, run_configuration)
+    benchmarks['evaluate_filepath_conditions'] = evaluate_conditions
+    benchmarks['collect_template_dir'] = lambda: cli.collect_template_dir(args, archetype + os.sep, os.curdir,
+                                                                          run_configuration)
+
+    validations = utils.compile_validations([{'evaluation': 'REGEX', 'value': '^[a-z][a-z0-9-]*$'},
+                                             {'evaluation': 'GREATER_THAN', 'value': 0}])
+    benchmarks['is_valid_input'] = lambda: utils.is_valid_input('benchmark-project', validations)
+
+    template = next((path for path, _, _ in jobs if not utils.template_scan.scan(path)[1]), jobs[0][0])
+    with open(template) as f:
+        content = f.read()
+    benchmarks['render_template'] = lambda: utils.render_template(content, run_configuration)
+    benchmarks['render_destination_path'] = lambda: [utils.render_destination_path(destination, run_configuration)
+                                                     for destination in reported]
+    pystache_engine = utils.render_engines['pystache']
+    benchmarks['render_template_pystache'] = lambda: pystache_engine.render(content, run_configuration)
+    benchmarks['render_destination_path_pystache'] = lambda: [pystache_engine.render(destination, run_configuration)
+                                                              for destination in reported]
+    # What the compiled engine pays once per template, against render_template_pystache for every render before it.
+    parsed = parse(content)
+    benchmarks['compile_template'] = lambda: compile_template(parsed)
+    # The template repeated until it is as large as a few pieces of a streamed template.
+    streamed = [content] * max(1, 4 * 1024 * 1024 // max(len(content), 1))
+    benchmarks['render_template_streamed'] = lambda: sum(
+        len(chunk) for chunk in render_chunks(streamed, run_configuration, utils.render_engine.render_once))
+
+    return {name: measure(function, repeat) for name, function in benchmarks.items() if selected(name)}
+
+
+def summarize(timings: list) -> dict:
+    return {'seconds': statistics.median(timings), 'min': min(timings), 'max': max(timings), 'repeat': len(timings)}
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> bool:
+    """Prints the change of every benchmark against the baseline. Returns whether any got slower than the threshold."""
+    regressed = False
+    rows = [('Benchmark', 'Baseline', 'Current', 'Change')]
+    for name, result in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            rows.append((name, '-', f'{result["seconds"]:.6f}', 'new'))
+            continue
+        change = (result['seconds'] - previous['seconds']) / previous['seconds'] * 100
+        slower = threshold is not None and change > threshold
+        regressed = regressed or slower
+        rows.append((name, f'{previous["seconds"]:.6f}', f'{result["seconds"]:.6f}',
+                     f'{change:+.1f}%{" regression" if slower else ""}'))
+    if baseline.get('parameters') != results['parameters']:
+        print('Warning: the baseline was run against a different archetype, see its parameters.')
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark generoo against a synthetic archetype.')
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5, help='Repeats per benchmark. Defaults to 5.')
+    parser.add_argument('--jobs', type=int, default=1, help='--jobs for the end to end benchmarks. Defaults to 1.')
+    parser.add_argument('--filter', help='Only runs the benchmarks whose name contains the given text.')
+    parser.add_argument('--output', help='Writes the results to the given JSON file.')
+    parser.add_argument('--compare', help='Compares the results with an earlier results file.')
+    parser.add_argument('--threshold', type=float,
+                        help='With --compare, fails when a benchmark is slower by more than this percentage.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='generoo-benchmark-') as work:
+        archetype = os.path.join(work, 'archetype')
+        parameters = build_archetype(archetype, args.files, args.depth, args.size, args.tag_density,
+                                     args.conditional_density, args.seed)
+        parameters['jobs'] = args.jobs
+
+        def selected(name: str) -> bool:
+            return not args.filter or args.filter in name
+        timings = end_to_end_benchmarks(archetype, work, args.repeat, args.jobs, selected)
+        timings.update(micro_benchmarks(archetype, args.repeat, selected))
+
+    results = {
+        'version': results_version,
+        'generoo': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'results': {name: summarize(timing) for name, timing in timings.items()},
+    }
+    for name, result in results['results'].items():
+        print(f'{name}: {result["seconds"] * 1000:.4f} ms')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,10 @@
 name = "generoo"
+version = "2019.07.24.6"
+
+
+def __getattr__(attribute):
+    # generoo.generate is imported on first use, keeping the generation modules out of the startup of the command line.
+    if attribute in ('generate', 'GenerationResult'):
+        from generoo import api
+        return getattr(api, attribute)
+    raise AttributeError(f'module {__name__!r} has no attribute {attribute!r}')
@@ -0,0 +1,66 @@
+import os
+
+from generoo.batch import default_prompter
+from generoo.bundle import is_bundle
+from generoo.generoo import build_parser, full_scope_name, get_template_configuration_metadata, generate_run, \
+    template_filename, GenerationResult
+from generoo.sources import is_source
+from generoo.utils import template_scan, plan_cache
+
+# The command line options generoo.generate takes as keyword arguments.
+generation_options = ['jobs', 'copy_mode', 'fsync']
+
+
+def generate(template: str, config: str = None, answers: dict = None, output: str = None, scope: str = 'project',
+             prompter=None, log=None, archive: str = None, **options) -> GenerationResult:
+    """
+    Generates a project in process, the way generoo generate does, without reading from stdin or writing to stdout.
+
+        result = generoo.generate('my-templates', answers={'artifact_id': 'inventory'}, output='inventory')
+
+    Prompts answered by answers are not asked. Every other prompt is asked to the prompter, or takes its default when
+    there is no prompter, as in batch runs, and the generation fails for a prompt without one. Progress messages, such
+    as the path of every file written, go to log, and nowhere by default.
+
+    Parsed templates, template scans and template configurations are cached as on the command line. The render engine
+    and stream threshold are the ones set with generoo.utils.use_render_engine and use_stream_threshold. Transformation
+    plugins of bundles, archives and git repositories only run after generoo.transformations.allow_plugins, as with
+    --allow-plugins.
+
+    :param template: a template directory, a single template, a bundle made by the pack goal, a tar or zip archive or
+        a ref of a local git repository, as REPOSITORY@REF.
+    :param config: the template configuration, by default the one for the scope in the template directory or bundle.
+    :param answers: values of prompts, as in a run configuration.
+    :param output: the directory to generate the project in, which names the project.
+    :param scope: the generator scope, only project for now.
+    :param prompter: callable that takes a prompt and returns the answer to it.
+    :param log: callable that takes every progress message, e.g. print.
+    :param archive: streams the project into this archive instead of writing it to disk, see --output-archive.
+    :param options: jobs, copy_mode and fsync, as their command line options.
+    :return: the files written, bytes written and seconds taken, see GenerationResult.
+    """
+    if not template:
+        raise AttributeError('A template directory, template or bundle is required.')
+    if not output:
+        raise AttributeError('An output directory for the project is required.')
+    if full_scope_name(scope) is None:
+        raise AttributeError(f'Did not recognize the scope provided: {scope}')
+    args = build_parser().parse_args(['generate'])
+    args.scope = scope
+    args.name = output
+    args.template = template
+    args.template_config = config
+    args.output_archive = archive
+    args.log = log
+    for option, value in options.items():
+        if option not in generation_options:
+            raise TypeError(f'generate() got an unexpected keyword argument {option!r}')
+        setattr(args, option, value)
+    if config is None and not (os.path.isfile(template) and is_bundle(template)) and not is_source(template):
+        args.template_config = os.path.join(template, f'{full_scope_name(scope)}{template_filename}')
+    template_directory, template_file = get_template_configuration_metadata(args)
+    try:
+        return generate_run(args, template_directory, template_file, answers or {}, prompter or default_prompter)
+    finally:
+        template_scan.save()
+        plan_cache.save()
@@ -0,0 +1,159 @@
+import argparse
+import copy
+import json
+import os
+import time
+
+from generoo.generoo import get_template_configuration_metadata, load_template_configuration, override_defaults, \
+    extract_run_configuration, render_project, used_names, GenerationError
+from generoo.output import ArchiveWriter
+from generoo.profiling import profiler
+from generoo.utils import is_valid_input, yes_no_to_bool, template_cache, template_scan, configuration_cache, \
+    plan_cache, source_cache, load_configuration_file, load_yaml
+
+
+def load_manifest(manifest_file: str) -> list:
+    """
+    Loads the batch manifest. A manifest is either a YAML file holding a list of projects (or a mapping with a
+    `projects` list), or a JSONL file holding one project per line.
+
+    Each project has a `name` and a `run_configuration`, which is either the run configuration itself or the path to a
+    run configuration file relative to the manifest.
+
+    :param manifest_file:
+    :return: a list of (name, run configuration) tuples.
+    """
+    with open(manifest_file) as f:
+        raw_manifest = f.read()
+    if manifest_file.endswith('.jsonl'):
+        projects = [json.loads(line) for line in raw_manifest.splitlines() if line.strip()]
+    else:
+        projects = load_yaml(raw_manifest)
+        if isinstance(projects, dict):
+            projects = projects.get('projects')
+    if not isinstance(projects, list):
+        raise AttributeError(f'{manifest_file} must contain a list of projects.')
+
+    manifest = []
+    for project in projects:
+        name = project.get('name')
+        if not name:
+            raise AttributeError(f'Every project in {manifest_file} needs a name.')
+        run_configuration = project.get('run_configuration') or {}
+        if isinstance(run_configuration, str):
+            run_configuration = load_configuration_file(os.path.join(os.path.dirname(manifest_file),
+                                                                     run_configuration))
+        manifest.append((name, run_configuration))
+    return manifest
+
+
+def default_prompter(prompt: dict):
+    """
+    Answers a prompt with its default instead of asking for input, since batch runs are not interactive. Prompts that
+    are not answered by the run configuration and have no default fail the project.
+
+    :param prompt:
+    :return:
+    """
+    if 'default' not in prompt:
+        raise AttributeError(f'No value for prompt {prompt["name"]} in the run configuration and no default.')
+    value = prompt['default']
+    if prompt.get('type') == 'BOOL':
+        return yes_no_to_bool(value) if isinstance(value, str) else value
+    if not is_valid_input(value, prompt.get('compiled_validations') or prompt.get('validations')):
+        raise AttributeError(f'Default value {value} for prompt {prompt["name"]} does not pass its validations.')
+    return value
+
+
+def generate_batch_project(args: argparse.Namespace, template_directory: str, template_configuration: dict,
+                           name: str, run_configuration: dict, writer: ArchiveWriter = None, used: set = None):
+    """
+    Generates a single project of the batch from the already loaded template configuration.
+
+    :param args:
+    :param template_directory:
+    :param template_configuration:
+    :param name:
+    :param run_configuration:
+    :param writer: the archive shared by every project of the batch, if any.
+    :param used: the names the templates refer to, see used_names.
+    :return:
+    """
+    project_args = argparse.Namespace(**vars(args))
+    project_args.name = name
+    if args.jobs > 1:
+        # Projects already run in parallel, so each one renders its own templates serially.
+        project_args.jobs = 1
+    project_configuration = override_defaults(copy.deepcopy(template_configuration), run_configuration)
+    with profiler.phase('extract_run_configuration'):
+        project_run_configuration = extract_run_configuration(project_configuration, True, default_prompter, used)
+    render_project(project_args, template_directory, project_configuration, project_run_configuration, writer)
+
+
+def generate_batch(args: argparse.Namespace):
+    """
+    Generates every project listed in the manifest given as the name argument. The template configuration is loaded
+    and the template directory walked once for all of them.
+
+    A failing project does not stop the others. A report of the time taken by each project is printed at the end and a
+    GenerationError is raised if any of them failed. With --output-archive every project goes into the same archive.
+
+    :param args:
+    :return:
+    """
+    manifest = load_manifest(args.name)
+    template_directory, template_file = get_template_configuration_metadata(args)
+    with profiler.phase('load_template_configuration'):
+        template_configuration = load_template_configuration(template_file)
+    used = used_names(template_directory, template_configuration)
+    writer = ArchiveWriter(args.output_archive) if args.output_archive else None
+
+    def generate(project):
+        name, run_configuration = project
+        start = time.perf_counter()
+        try:
+            generate_batch_project(args, template_directory, template_configuration, name, run_configuration, writer,
+                                   used)
+            error = None
+        except Exception as e:
+            error = e
+        return name, time.perf_counter() - start, error
+
+    try:
+        if args.jobs > 1 and len(manifest) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                results = list(executor.map(generate, manifest))
+        else:
+            results = [generate(project) for project in manifest]
+    finally:
+        if writer is not None:
+            writer.close()
+    template_cache.evict()
+    configuration_cache.evict()
+    plan_cache.evict()
+    source_cache.evict()
+    template_scan.save()
+    plan_cache.save()
+
+    print_batch_report(results)
+    failures = [result for result in results if result[2] is not None]
+    if failures:
+        raise GenerationError(f'Failed to generate {len(failures)} of {len(results)} projects.')
+
+
+def print_batch_report(results: list):
+    """
+    Prints the name, status and time taken of every project in the batch.
+
+    :param results: a list of (name, seconds, error) tuples.
+    :return:
+    """
+    name_width = max([len('Project')] + [len(name) for name, _, _ in results])
+    print(f'{"Project".ljust(name_width)}  Status  Seconds')
+    for name, seconds, error in results:
+        status = 'ok' if error is None else 'failed'
+        print(f'{name.ljust(name_width)}  {status.ljust(6)}  {seconds:7.3f}')
+    for name, _, error in results:
+        if error is not None:
+            print(f'{name}: {type(error).__name__}: {error}')
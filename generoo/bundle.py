@@ -0,0 +1,216 @@
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+from generoo.profiling import profiler
+
+# magic, format version, offset and length of the index
+header = struct.Struct('<8sIQQ')
+magic = b'GENEROO\0'
+bundle_version = 1
+excluded_bundle_directories = ['__pycache__', '.generoo', '.git']
+bundles = {}
+bundles_lock = threading.Lock()
+
+
+class Bundle:
+    """
+    An archetype packed into a single file by pack_bundle, read through mmap without extracting it.
+
+    The file starts with a fixed header pointing at the JSON index at its end. The index lists every directory with its
+    subdirectories and files, in the order os.walk visited them when the bundle was packed, and every file with the
+    offset and length of its content, its permissions, its content hash and whether it is free of Mustache tags. The
+    contents are stored one after the other between the header and the index.
+
+    Paths of templates in a bundle are the path of the bundle followed by the path of the template inside it, e.g.
+    spring-boot.gpack/pom.xml, see find_bundle.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < header.size:
+            raise AttributeError(f'{path} is not a generoo bundle.')
+        file_magic, version, index_offset, index_length = header.unpack_from(self.map)
+        if file_magic != magic:
+            raise AttributeError(f'{path} is not a generoo bundle.')
+        if version != bundle_version:
+            raise AttributeError(f'{path} is a version {version} bundle, this generoo reads version {bundle_version}. '
+                                 f'Pack it again.')
+        index = json.loads(self.map[index_offset:index_offset + index_length].decode('utf-8'))
+        self.directories = index['directories']
+        self.files = index['files']
+        self.configs = index['configs']
+
+    def isdir(self, relative: str) -> bool:
+        return relative in self.directories
+
+    def isfile(self, relative: str) -> bool:
+        return relative in self.files
+
+    def entry(self, relative: str) -> dict:
+        entry = self.files.get(relative)
+        if entry is None:
+            raise FileNotFoundError(f'No such file in {self.path}: {relative}')
+        return entry
+
+    def list(self, relative: str) -> (list, list):
+        """Returns the names of the subdirectories and of the files of a directory in the bundle."""
+        directory = self.directories.get(relative)
+        if directory is None:
+            raise FileNotFoundError(f'No such directory in {self.path}: {relative}')
+        return directory['directories'], directory['files']
+
+    def view(self, relative: str) -> memoryview:
+        """Returns the content of a file as a view of the mapped bundle, without copying it."""
+        entry = self.entry(relative)
+        profiler.count(read=entry['length'])
+        return memoryview(self.map)[entry['offset']:entry['offset'] + entry['length']]
+
+    def read(self, relative: str) -> bytes:
+        entry = self.entry(relative)
+        profiler.count(read=entry['length'])
+        return self.map[entry['offset']:entry['offset'] + entry['length']]
+
+    def mode(self, relative: str) -> int:
+        return self.entry(relative)['mode']
+
+    def scan(self, relative: str) -> (str, bool):
+        """The content hash of a file and whether it is free of Mustache tags, as computed when it was packed."""
+        entry = self.entry(relative)
+        return entry['hash'], entry['tag_free']
+
+
+def is_bundle(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(magic)) == magic
+    except OSError:
+        return False
+
+
+def open_bundle(path: str) -> Bundle:
+    """
+    Opens the bundle and registers it, so that the paths of the templates in it can be read like files, see find_bundle.
+    A bundle is opened once per process.
+
+    :param path:
+    :return:
+    """
+    path = os.path.normpath(path)
+    with bundles_lock:
+        bundle = bundles.get(path)
+        if bundle is None:
+            bundle = bundles[path] = Bundle(path)
+    return bundle
+
+
+def find_bundle(path: str) -> (Bundle, str):
+    """
+    Returns the opened bundle the path points into and the path inside the bundle, '' for its root, or None twice when
+    the path is not in a bundle.
+
+    :param path:
+    :return:
+    """
+    if not bundles:
+        return None, None
+    path = os.path.normpath(path)
+    for bundle_path, bundle in bundles.items():
+        if path == bundle_path:
+            return bundle, ''
+        if path.startswith(bundle_path + os.sep):
+            return bundle, path[len(bundle_path) + 1:].replace(os.sep, '/')
+    return None, None
+
+
+def is_template_directory(path: str) -> bool:
+    bundle, relative = find_bundle(path)
+    if bundle is None:
+        return os.path.isdir(path)
+    return bundle.isdir(relative)
+
+
+def file_size(path: str) -> int:
+    bundle, relative = find_bundle(path)
+    if bundle is None:
+        return os.path.getsize(path)
+    return bundle.entry(relative)['length']
+
+
+def read_bytes(path: str) -> bytes:
+    """Reads a file, or a template in an opened bundle."""
+    bundle, relative = find_bundle(path)
+    if bundle is None:
+        with open(path, 'rb') as f:
+            content = f.read()
+        profiler.count(read=len(content))
+        return content
+    return bundle.read(relative)
+
+
+def pack_bundle(directory: str, path: str) -> dict:
+    """
+    Packs the archetype in the directory into a bundle at the given path. The bundle is written next to its path first
+    and moved into place once it is complete.
+
+    :param directory: a template directory with at least one template configuration.
+    :param path:
+    :return: the index of the bundle.
+    """
+    from generoo.cache import is_text
+    from generoo.utils import load_configuration_file
+    configs = sorted(name for name in os.listdir(directory)
+                     if name.endswith('-template-config.json') and os.path.isfile(os.path.join(directory, name)))
+    if not configs:
+        raise AttributeError(f'{directory} has no template configuration to pack.')
+    for config in configs:
+        load_configuration_file(os.path.join(directory, config))
+
+    directories = {}
+    files = {}
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_path, 'wb') as bundle:
+            bundle.write(header.pack(magic, bundle_version, 0, 0))
+            for root, dirs, names in os.walk(directory):
+                # Like os.walk, symbolic links to directories are not followed.
+                dirs[:] = [d for d in dirs
+                           if d not in excluded_bundle_directories and not os.path.islink(os.path.join(root, d))]
+                relative_root = os.path.relpath(root, directory).replace(os.sep, '/')
+                relative_root = '' if relative_root == '.' else relative_root
+                names = sorted(names)
+                directories[relative_root] = {'directories': list(dirs), 'files': names}
+                for name in names:
+                    source = os.path.join(root, name)
+                    with open(source, 'rb') as f:
+                        content = f.read()
+                    files[f'{relative_root}/{name}' if relative_root else name] = {
+                        'offset': bundle.tell(),
+                        'length': len(content),
+                        'mode': os.stat(source).st_mode & 0o777,
+                        'hash': hashlib.sha1(content).hexdigest(),
+                        # Binary files are copied as they are, like files without tags, see TemplateScan.read.
+                        'tag_free': b'{{' not in content or
+                                    not is_text(codecs.getincrementaldecoder('utf-8')(), content, True),
+                    }
+                    bundle.write(content)
+            index = {'configs': configs, 'directories': directories, 'files': files}
+            raw_index = json.dumps(index, sort_keys=True).encode('utf-8')
+            index_offset = bundle.tell()
+            bundle.write(raw_index)
+            bundle.seek(0)
+            bundle.write(header.pack(magic, bundle_version, index_offset, len(raw_index)))
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+    return index
@@ -0,0 +1,528 @@
+import atexit
+import codecs
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+
+from generoo import version
+from generoo.bundle import find_bundle
+from generoo.profiling import profiler
+
+default_cache_size = 64 * 1024 * 1024
+default_configuration_cache_size = 16 * 1024 * 1024
+default_source_cache_size = 256 * 1024 * 1024
+max_parsed_templates = 4096
+# Eviction walks the whole cache, so it runs at most once per interval, and hits only refresh the modification time of
+# entries that are older than it, which is all least recently used eviction needs.
+eviction_interval = 60 * 60
+eviction_stamp = '.evicted'
+
+
+class MemoryCache:
+    """
+    A dict of at most max_entries entries that drops the least recently used one when it is full, for what a process
+    keeps in memory, such as parsed templates, which would otherwise grow for as long as a server runs.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.entries.pop(key, default)
+            if value is not default:
+                self.entries[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def cache_directory() -> str:
+    """
+    Resolves the directory Generoo keeps its caches in. The GENEROO_CACHE_DIR environment variable takes precedence,
+    then XDG_CACHE_HOME, then ~/.cache.
+    """
+    directory = os.environ.get('GENEROO_CACHE_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'generoo')
+
+
+class TemplateCache:
+    """
+    Keeps parsed Mustache templates between runs so that unchanged templates are only parsed once.
+
+    Entries are keyed by the SHA-1 of the template text and kept both in memory for the current process and pickled on
+    disk under the cache directory. Every hit refreshes the modification time of the entry on disk, which is what
+    eviction uses to drop the least recently used entries once the cache grows past its maximum size. In memory, the
+    last max_parsed_templates templates used are kept.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = default_cache_size, enabled: bool = True):
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+        self.parsed = MemoryCache(max_parsed_templates)
+
+    def entries_directory(self) -> str:
+        """Entries are namespaced by pystache version since the pickled parse tree is pystache's own structure."""
+        import pystache
+        return os.path.join(self.directory or cache_directory(), f'templates-{pystache.__version__}')
+
+    def parse(self, template: str):
+        """
+        Returns the parsed form of the template, loading it from the cache or parsing and storing it on a miss. Returns
+        the template unchanged when the cache is disabled so the renderer parses it as it always has.
+
+        :param template:
+        :return:
+        """
+        if not self.enabled:
+            return template
+        key = hashlib.sha1(template.encode('utf-8')).hexdigest()
+        parsed = self.parsed.get(key)
+        if parsed is None:
+            entry = os.path.join(self.entries_directory(), key[:2], key)
+            parsed = load_entry(entry)
+            if parsed is None:
+                from pystache import parse
+                parsed = parse(template)
+                store_entry(entry, parsed)
+            self.parsed[key] = parsed
+        return parsed
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache on disk fits in its maximum size.
+        """
+        if self.enabled:
+            evict_entries(self.entries_directory(), self.max_size)
+
+
+class ConfigurationCache:
+    """
+    Keeps loaded and compiled template configurations between runs, keyed by the SHA-1 of the configuration file, so
+    that an unchanged configuration is neither parsed nor compiled again. Entries are namespaced by generoo version since
+    they hold generoo's compiled validations, and are evicted like the template cache.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = default_configuration_cache_size, enabled: bool = True):
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+
+    def entries_directory(self) -> str:
+        return os.path.join(self.directory or cache_directory(), f'configurations-{version}')
+
+    def load(self, key: str):
+        if not self.enabled:
+            return None
+        return load_entry(os.path.join(self.entries_directory(), key))
+
+    def store(self, key: str, configuration: dict):
+        if self.enabled:
+            store_entry(os.path.join(self.entries_directory(), key), configuration)
+
+    def evict(self):
+        if self.enabled:
+            evict_entries(self.entries_directory(), self.max_size)
+
+
+def load_entry(entry: str):
+    """
+    Unpickles a cache entry and marks it as recently used, unless it already was within the eviction interval. Returns
+    None if it is missing or unreadable.
+    """
+    try:
+        with open(entry, 'rb') as f:
+            value = pickle.load(f)
+            modified = os.fstat(f.fileno()).st_mtime
+        if time.time() - modified > eviction_interval:
+            os.utime(entry)
+        return value
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def store_entry(entry: str, value):
+    """Pickles a cache entry through a temporary file so that readers never see a partial entry."""
+    temporary_entry = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with open(temporary_entry, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_entry, entry)
+    except OSError:
+        # The cache is an optimization; a read-only or full disk should never fail a generation.
+        try:
+            os.remove(temporary_entry)
+        except OSError:
+            pass
+
+
+def is_text(decoder, chunk: bytes, final: bool = False) -> bool:
+    """Feeds the next chunk of a file to an incremental UTF-8 decoder and returns whether the file still decodes."""
+    try:
+        decoder.decode(chunk, final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def evict_entries(directory: str, max_size: int):
+    """
+    Removes the least recently used entries under the directory until they fit in the maximum size, unless that was
+    already done within the eviction interval.
+    """
+    stamp = os.path.join(directory, eviction_stamp)
+    try:
+        if time.time() - os.stat(stamp).st_mtime < eviction_interval:
+            return
+    except OSError:
+        if not os.path.isdir(directory):
+            return
+    try:
+        with open(stamp, 'a'):
+            os.utime(stamp)
+    except OSError:
+        pass
+    entries = []
+    total_size = 0
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if name == eviction_stamp:
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_size -= size
+
+
+class TemplateScan:
+    """
+    Remembers, for every template file, the SHA-1 of its content and whether it contains any Mustache tags. Templates
+    without tags are copied to their destination as they are instead of being rendered, and so are binary files, such as
+    images or jars, that are not valid UTF-8, whether or not they happen to contain {{.
+
+    Entries are keyed by the real path of the template and are valid as long as its size and modification time do not
+    change. They are kept in a single pickle in the cache directory, loaded on first use and written back by save.
+    """
+
+    chunk_size = 1024 * 1024
+    # Changes whenever what a scan concludes changes, so that entries of older scans are not trusted.
+    scan_format = 2
+
+    def __init__(self, directory: str = None, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.entries = None
+        self.modified = False
+        self.names_entries = None
+        self.names_modified = False
+        self.lock = threading.Lock()
+
+    def path(self) -> str:
+        return os.path.join(self.directory or cache_directory(), f'template-scan-{self.scan_format}.pickle')
+
+    def names_path(self) -> str:
+        return os.path.join(self.directory or cache_directory(), 'template-names.pickle')
+
+    def scan(self, template: str) -> (str, bool):
+        """
+        Returns the content hash of the template and whether it is free of Mustache tags.
+
+        :param template:
+        :return:
+        """
+        bundle, relative = find_bundle(template)
+        if bundle is not None:
+            return bundle.scan(relative)
+        stat = os.stat(template)
+        key = os.path.realpath(template)
+        if self.enabled:
+            with self.lock:
+                if self.entries is None:
+                    self.entries = self.load()
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                return entry[2], entry[3]
+        content_hash, tag_free = self.read(template)
+        if self.enabled:
+            self.entries[key] = (stat.st_size, stat.st_mtime_ns, content_hash, tag_free)
+            self.modified = True
+        return content_hash, tag_free
+
+    def names(self, template: str, extract) -> (frozenset, frozenset):
+        """
+        Returns the names the template refers to, and the ones it refers to outside of any section, see
+        generoo.usage.template_names. They are extracted with extract on a miss and kept by the content hash of the
+        template, in a pickle of their own next to the scan.
+
+        :param template:
+        :param extract: takes the path of the template and returns its names.
+        :return:
+        """
+        content_hash, tag_free = self.scan(template)
+        if tag_free:
+            return frozenset(), frozenset()
+        if self.enabled:
+            with self.lock:
+                if self.names_entries is None:
+                    self.names_entries = load_entry(self.names_path()) or {}
+            names = self.names_entries.get(content_hash)
+            if names is not None:
+                return names
+        names = extract(template)
+        if self.enabled:
+            self.names_entries[content_hash] = names
+            self.names_modified = True
+        return names
+
+    def read(self, template: str) -> (str, bool):
+        content_hash = hashlib.sha1()
+        tag_free = True
+        text = True
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        tail = b''
+        with open(template, 'rb') as f:
+            chunk = f.read(self.chunk_size)
+            while chunk:
+                content_hash.update(chunk)
+                if b'{{' in tail + chunk[:1] or b'{{' in chunk:
+                    tag_free = False
+                if text:
+                    text = is_text(decoder, chunk)
+                tail = chunk[-1:]
+                profiler.count(read=len(chunk))
+                chunk = f.read(self.chunk_size)
+        if text:
+            text = is_text(decoder, b'', True)
+        return content_hash.hexdigest(), tag_free or not text
+
+    def load(self) -> dict:
+        try:
+            with open(self.path(), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+            return {}
+
+    def save(self):
+        if self.enabled and self.modified:
+            store_entry(self.path(), dict(self.entries))
+            self.modified = False
+        if self.enabled and self.names_modified:
+            store_entry(self.names_path(), dict(self.names_entries))
+            self.names_modified = False
+
+
+class PlanCache:
+    """
+    Keeps the plans of generations, the template and destination of every file with the conditions of its path resolved,
+    see generoo.generoo.plan_project, so that generating a project again with the same values in its paths neither walks
+    the template tree nor renders a single path.
+
+    There is an entry per template tree, keyed by what the plan depends on besides the run configuration, the template
+    directory and its mappings, and shared by every project generated from it. It holds the modification time of every
+    directory of the tree, which changes whenever anything in the directory is added, removed or renamed, the names the
+    paths of the tree refer to, and the plans for the last max_plans combinations of their values. Entries are loaded
+    on first use, written back by save, namespaced by generoo version and evicted like the template cache.
+    """
+
+    max_plans = 64
+
+    def __init__(self, directory: str = None, max_size: int = default_configuration_cache_size, enabled: bool = True):
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+        self.entries = {}
+        self.modified = set()
+        self.lock = threading.Lock()
+
+    def entries_directory(self) -> str:
+        return os.path.join(self.directory or cache_directory(), f'plans-{version}')
+
+    def load(self, key: str):
+        """Returns the entry of a template tree if it is still current, or None."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = load_entry(os.path.join(self.entries_directory(), key))
+                if entry is None:
+                    return None
+                self.entries[key] = entry
+        for path, mtime in entry['fingerprint'].items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return None
+            except OSError:
+                return None
+        return entry
+
+    def store(self, key: str, entry: dict, values: str, jobs: list):
+        """Adds the plan for the values of the names of the entry, dropping the least recently added plans."""
+        if not self.enabled:
+            return
+        with self.lock:
+            current = self.entries.get(key)
+            if current is not None and current['fingerprint'] == entry['fingerprint']:
+                entry = current
+            plans = entry['plans']
+            plans.pop(values, None)
+            plans[values] = jobs
+            while len(plans) > self.max_plans:
+                del plans[next(iter(plans))]
+            self.entries[key] = entry
+            self.modified.add(key)
+
+    def save(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            modified = [(key, dict(self.entries[key], plans=dict(self.entries[key]['plans'])))
+                        for key in self.modified]
+            self.modified = set()
+        for key, entry in modified:
+            store_entry(os.path.join(self.entries_directory(), key), entry)
+
+    def evict(self):
+        if self.enabled:
+            evict_entries(self.entries_directory(), self.max_size)
+
+
+class SourceCache:
+    """
+    Keeps archetypes materialized from git repositories and archives, see generoo.sources, so that generating from the
+    same revision or archive again costs nothing but resolving it.
+
+    Entries are directories keyed by what they were materialized from, such as a commit hash or the content hash of an
+    archive, so an entry never goes stale and is never materialized twice. Every entry holds the materialized tree and
+    its size, and using it refreshes its modification time, which is what eviction uses to drop the least recently used
+    entries once the cache grows past its maximum size. Entries used by the current process are never evicted.
+
+    When the cache is disabled, archetypes are materialized into temporary directories removed when the process exits.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = default_source_cache_size, enabled: bool = True):
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+        self.used = set()
+        self.lock = threading.Lock()
+
+    def entries_directory(self) -> str:
+        return os.path.join(self.directory or cache_directory(), 'sources')
+
+    def materialize(self, key: str, extract) -> str:
+        """
+        Returns the directory of the materialized tree for the key, materializing it with extract on a miss.
+
+        :param key:
+        :param extract: takes a directory and writes the tree into it.
+        :return:
+        """
+        if not self.enabled:
+            entry = tempfile.mkdtemp(prefix='generoo-source-')
+            atexit.register(shutil.rmtree, entry, True)
+            extract(os.path.join(entry, 'tree'))
+            return os.path.join(entry, 'tree')
+        entry = os.path.join(self.entries_directory(), key)
+        with self.lock:
+            self.used.add(entry)
+            if not os.path.isdir(entry):
+                # Trees are materialized next to the entry and renamed into place, so that readers never see a partial
+                # tree and concurrent processes materializing the same key settle on one of them.
+                temporary_entry = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+                shutil.rmtree(temporary_entry, True)
+                try:
+                    extract(os.path.join(temporary_entry, 'tree'))
+                    with open(os.path.join(temporary_entry, 'size'), 'w') as f:
+                        f.write(str(tree_size(os.path.join(temporary_entry, 'tree'))))
+                    os.replace(temporary_entry, entry)
+                except OSError:
+                    if not os.path.isdir(entry):
+                        raise
+                finally:
+                    shutil.rmtree(temporary_entry, True)
+            try:
+                if time.time() - os.stat(entry).st_mtime > eviction_interval:
+                    os.utime(entry)
+            except OSError:
+                pass
+        return os.path.join(entry, 'tree')
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache on disk fits in its maximum size.
+        """
+        if not self.enabled:
+            return
+        directory = self.entries_directory()
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        entries = []
+        total_size = 0
+        for name in names:
+            entry = os.path.join(directory, name)
+            try:
+                with open(os.path.join(entry, 'size')) as f:
+                    size = int(f.read())
+                mtime = os.stat(entry).st_mtime
+            except (OSError, ValueError):
+                continue
+            entries.append((mtime, size, entry))
+            total_size += size
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            if entry in self.used:
+                continue
+            shutil.rmtree(entry, True)
+            total_size -= size
+
+
+def tree_size(directory: str) -> int:
+    """The total size of the files under the directory."""
+    size = 0
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+
+from generoo.cache import cache_directory
+from generoo.utils import template_scan
+
+excluded_archetypal_directories = ['common', '__pycache__']
+template_config_suffix = '-template-config.json'
+catalog_version = 1
+catalogs = {}
+
+
+def catalog_path(root: str) -> str:
+    key = hashlib.sha1(os.path.realpath(root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_directory(), f'catalog-{key}.json')
+
+
+def list_directories(directory: str) -> list:
+    return sorted(entry.name for entry in os.scandir(directory)
+                  if entry.is_dir() and entry.name not in excluded_archetypal_directories)
+
+
+def directory_fingerprint(root: str, excluded: list = excluded_archetypal_directories) -> dict:
+    """
+    Records the modification time of every directory under the archetype root. Adding, removing or renaming anything
+    changes the time of its parent directory, so comparing fingerprints only needs a stat per directory.
+    """
+    fingerprint = {}
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in excluded]
+        fingerprint[os.path.relpath(directory, root)] = os.stat(directory).st_mtime_ns
+    return fingerprint
+
+
+def is_current(catalog: dict, root: str) -> bool:
+    if catalog.get('version') != catalog_version or catalog.get('root') != os.path.realpath(root):
+        return False
+    for directory, mtime in catalog['fingerprint'].items():
+        try:
+            if os.stat(os.path.join(root, directory)).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def describe_version(directory: str) -> dict:
+    """
+    Collects the template configuration files, the number of files and a content hash of an archetype version.
+
+    :param directory:
+    :return:
+    """
+    configs = sorted(name for name in os.listdir(directory)
+                     if name.endswith(template_config_suffix) and os.path.isfile(os.path.join(directory, name)))
+    tree_hash = hashlib.sha1()
+    files = 0
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            content_hash, _ = template_scan.scan(path)
+            tree_hash.update(f'{os.path.relpath(path, directory)}\0{content_hash}\n'.encode('utf-8'))
+            files += 1
+    return {'configs': configs, 'files': files, 'hash': tree_hash.hexdigest()}
+
+
+def build_catalog(root: str) -> dict:
+    """
+    Walks the archetype root and indexes every language, framework and version under it.
+
+    :param root:
+    :return:
+    """
+    languages = {}
+    for language in list_directories(root):
+        frameworks = {}
+        for framework in list_directories(os.path.join(root, language)):
+            versions = {}
+            for version in list_directories(os.path.join(root, language, framework)):
+                versions[version] = describe_version(os.path.join(root, language, framework, version))
+            frameworks[framework] = versions
+        languages[language] = frameworks
+    return {'version': catalog_version, 'root': os.path.realpath(root), 'fingerprint': directory_fingerprint(root),
+            'languages': languages}
+
+
+def load_catalog(root: str, use_cache: bool = True) -> dict:
+    """
+    Returns the catalog of the archetypes under the root. The catalog is kept in the cache directory and rebuilt when
+    any directory under the root has changed since it was built.
+
+    Changes to the content of existing files do not touch any directory, so the file counts and hashes of an edited
+    archetype are only refreshed with the next structural change or a run with --no-cache.
+
+    :param root:
+    :param use_cache:
+    :return:
+    """
+    catalog = catalogs.get(root)
+    if catalog is not None:
+        return catalog
+    path = catalog_path(root)
+    if use_cache:
+        try:
+            with open(path) as f:
+                catalog = json.load(f)
+            if not is_current(catalog, root):
+                catalog = None
+        except (OSError, ValueError):
+            catalog = None
+    if catalog is None:
+        catalog = build_catalog(root)
+        if use_cache:
+            save_catalog(path, catalog)
+    catalogs[root] = catalog
+    return catalog
+
+
+def save_catalog(path: str, catalog: dict):
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, 'w') as f:
+            json.dump(catalog, f, indent=2, sort_keys=True)
+        os.replace(temporary_path, path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def print_catalog(catalog: dict):
+    """
+    Prints every archetype of the catalog with its template configurations, number of files and content hash.
+
+    :param catalog:
+    :return:
+    """
+    rows = [('Archetype', 'Configs', 'Files', 'Hash')]
+    for language, frameworks in sorted(catalog['languages'].items()):
+        for framework, versions in sorted(frameworks.items()):
+            for version, description in sorted(versions.items()):
+                rows.append((f'{language}/{framework}/{version}', ', '.join(description['configs']),
+                             str(description['files']), description['hash'][:12]))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
@@ -0,0 +1,250 @@
+import html
+
+from generoo.cache import MemoryCache
+
+render_engine_names = ['compiled', 'pystache']
+max_compiled_size = 64 * 1024
+max_compiled_templates = 4096
+missing = object()
+seen = object()
+not_found = object()
+
+
+class Unsupported(Exception):
+    """Raised when a template or a value needs pystache itself to render, e.g. partials and lambdas."""
+
+
+class PystacheEngine:
+    """Renders templates with pystache's renderer, which walks the parse tree of the template on every render."""
+
+    name = 'pystache'
+
+    def __init__(self, parse):
+        """
+        :param parse: returns the pystache parse tree of a template, or the template itself, see TemplateCache.parse.
+        """
+        self.parse = parse
+        self.renderer = None
+
+    def render(self, template: str, parameters: dict) -> str:
+        return self.get_renderer().render(self.parse(template), parameters)
+
+    def render_once(self, template: str, parameters: dict) -> str:
+        """Renders a template that is not rendered again, such as a piece of a streamed template, without caching it."""
+        return self.get_renderer().render(template, parameters)
+
+    def get_renderer(self):
+        if self.renderer is None:
+            # The pystache renderer is only built once a template is rendered, keeping it out of startup.
+            from pystache import Renderer
+            self.renderer = Renderer()
+        return self.renderer
+
+
+class CompiledEngine:
+    """
+    Renders templates with Python functions compiled from their pystache parse tree, see compile_template. A template is
+    compiled once per process, after which rendering it is a single function call with no parse tree to walk.
+
+    Compiling a template costs about as much as rendering it a dozen times with pystache, see the compile_template and
+    render_template_pystache benchmarks of benchmarks/suite.py, so a template is only compiled the second time it is
+    rendered, as destination paths and the templates of batch and served generations are, and templates larger than
+    max_compiled_size are never compiled. Until then they are rendered by the fallback engine. The functions of the last
+    max_compiled_templates templates rendered are kept.
+
+    Templates the compiler does not support, and renders that meet values only pystache knows how to handle, are
+    rendered by the fallback engine instead, so the output is always the one pystache renders.
+    """
+
+    name = 'compiled'
+
+    def __init__(self, parse, fallback: PystacheEngine):
+        """
+        :param parse: returns the pystache parse tree of a template, or the template itself, see TemplateCache.parse.
+        :param fallback: renders what the compiled functions cannot.
+        """
+        self.parse = parse
+        self.fallback = fallback
+        self.functions = MemoryCache(max_compiled_templates)
+
+    def render(self, template: str, parameters: dict) -> str:
+        function = self.functions.get(template, missing)
+        if function is missing:
+            if len(template) <= max_compiled_size:
+                self.functions[template] = seen
+            return self.fallback.render(template, parameters)
+        if function is seen:
+            function = self.compile(template)
+            self.functions[template] = function
+        if function is not None and isinstance(parameters, dict):
+            try:
+                return function(parameters)
+            except Unsupported:
+                pass
+        return self.fallback.render(template, parameters)
+
+    def render_once(self, template: str, parameters: dict) -> str:
+        """
+        Renders a template that is not rendered again, such as a piece of a streamed template, with the fallback engine:
+        compiling a template only pays off when it is rendered more than once.
+        """
+        return self.fallback.render_once(template, parameters)
+
+    def clear(self):
+        self.functions.clear()
+
+    def compile(self, template: str):
+        parsed = self.parse(template)
+        if isinstance(parsed, str):
+            from pystache import parse
+            parsed = parse(parsed)
+        try:
+            return compile_template(parsed)
+        except (Unsupported, SyntaxError, RecursionError):
+            # SyntaxError is raised for sections nested deeper than Python allows blocks to nest.
+            return None
+
+
+def compile_template(parsed):
+    """
+    Compiles a pystache parse tree into a function that renders it against a run configuration, the way pystache's
+    Renderer does with its default settings: missing keys render empty, values are HTML escaped unless the tag is a
+    triple mustache and sections repeat for lists and render once for other truthy values.
+
+    Variables outside of any section are looked up in the run configuration dict directly. Inside a section they are
+    looked up in the section values first, innermost first, and in the run configuration last, like pystache's context
+    stack.
+
+    :param parsed: a pystache ParsedTemplate.
+    :return: a function taking the run configuration and returning the rendered template.
+    """
+    lines = ['def render(p):', '    s0 = (p,)', '    parts = []', '    a = parts.append']
+    compile_nodes(parsed, 0, 1, lines)
+    lines.append("    return ''.join(parts)")
+    namespace = {'resolve': resolve, 'section_values': section_values, 'to_string': to_string, 'escape': escape}
+    exec(compile('\n'.join(lines), '<generoo template>', 'exec'), namespace)
+    return namespace['render']
+
+
+def compile_nodes(parsed, depth: int, indent: int, lines: list):
+    prefix = '    ' * indent
+    start = len(lines)
+    for node in parsed._parse_tree:
+        if type(node) is str:
+            lines.append(f'{prefix}a({node!r})')
+            continue
+        kind = type(node).__name__
+        if kind in ('_CommentNode', '_ChangeNode'):
+            continue
+        if kind == '_EscapeNode':
+            lines.append(f'{prefix}v = {lookup(node.key, depth)}')
+            lines.append(f'{prefix}a(escape(v if v.__class__ is str else to_string(v)))')
+        elif kind == '_LiteralNode':
+            lines.append(f'{prefix}v = {lookup(node.key, depth)}')
+            lines.append(f'{prefix}a(v if v.__class__ is str else to_string(v))')
+        elif kind == '_SectionNode':
+            lines.append(f'{prefix}for c{depth + 1} in section_values({lookup(node.key, depth)}):')
+            lines.append(f'{prefix}    s{depth + 1} = (c{depth + 1},) + s{depth}')
+            compile_nodes(node.parsed, depth + 1, indent + 1, lines)
+        elif kind == '_InvertedNode':
+            lines.append(f'{prefix}if not {lookup(node.key, depth)}:')
+            compile_nodes(node.parsed_section, depth, indent + 1, lines)
+        else:
+            # Partials are loaded from disk by pystache, which generoo templates never rely on.
+            raise Unsupported(kind)
+    if len(lines) == start:
+        lines.append(f'{prefix}pass')
+
+
+def referenced_names(parsed, names: set, top_level: set, depth: int = 0):
+    """
+    Collects the names a pystache parse tree looks up, the first part of every dotted key, into names, and the ones
+    looked up outside of any section into top_level as well. Those can only come from the run configuration, while
+    names inside a section may come from the values of the section instead.
+
+    :param parsed: a pystache ParsedTemplate.
+    :param names:
+    :param top_level:
+    :param depth: the number of sections around the parse tree.
+    :return:
+    """
+    for node in parsed._parse_tree:
+        if type(node) is str:
+            continue
+        kind = type(node).__name__
+        if kind not in ('_EscapeNode', '_LiteralNode', '_SectionNode', '_InvertedNode'):
+            continue
+        if node.key != '.':
+            name = node.key.split('.')[0]
+            names.add(name)
+            if depth == 0:
+                top_level.add(name)
+        if kind == '_SectionNode':
+            referenced_names(node.parsed, names, top_level, depth + 1)
+        elif kind == '_InvertedNode':
+            referenced_names(node.parsed_section, names, top_level, depth)
+
+
+def lookup(key: str, depth: int) -> str:
+    """The expression looking up the key at the given section depth."""
+    if depth == 0 and key != '.' and '.' not in key:
+        return f'(p[{key!r}] if {key!r} in p else \'\')'
+    return f'resolve(s{depth}, {key!r})'
+
+
+def resolve(stack: tuple, name: str):
+    """Looks the name up in the stack, innermost first, like pystache's ContextStack.get. Missing names are ''."""
+    if name == '.':
+        return stack[0]
+    parts = name.split('.')
+    for item in stack:
+        value = get_value(item, parts[0])
+        if value is not not_found:
+            break
+    else:
+        return ''
+    for part in parts[1:]:
+        value = get_value(value, part)
+        if value is not_found:
+            return ''
+    return value
+
+
+def get_value(item, key: str):
+    if isinstance(item, dict):
+        if key in item:
+            return item[key]
+    elif type(item).__module__ != 'builtins':
+        try:
+            value = getattr(item, key)
+        except AttributeError:
+            pass
+        else:
+            return value() if callable(value) else value
+    return not_found
+
+
+def section_values(data) -> list:
+    if not data:
+        return []
+    try:
+        iter(data)
+    except TypeError:
+        values = [data]
+    else:
+        values = [data] if isinstance(data, (str, bytes, dict)) else list(data)
+    if any(callable(value) for value in values):
+        raise Unsupported('lambda')
+    return values
+
+
+def to_string(value) -> str:
+    if isinstance(value, str):
+        return value
+    if callable(value) or isinstance(value, bytes):
+        raise Unsupported(type(value).__name__)
+    return str(value)
+
+
+def escape(value: str) -> str:
+    return html.escape(value, quote=True)
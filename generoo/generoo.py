@@ -1,37 +1,86 @@
 import argparse
-import yaml
+import hashlib
 import os
-
-from pick import pick
-
-from generoo.utils import handle_prompt, convert_to_dashes, convert_to_slashes, convert_to_periods, \
-    convert_to_caps_no_spaces, convert_to_caps_with_spaces, render_template_to_directory, render_destination_path, \
-    is_valid_input, equals_ignore_case, convert_to_snake, convert_to_camel, yes_no_to_bool, convert_to_lower_with_spaces
+import sys
+import time
+from contextlib import redirect_stdout
+
+from generoo import version
+from generoo.bundle import open_bundle, is_bundle, is_template_directory, find_bundle, read_bytes, pack_bundle
+from generoo.catalog import load_catalog, print_catalog, excluded_archetypal_directories
+from generoo.engines import render_engine_names
+from generoo.streaming import default_stream_threshold
+from generoo.sources import is_source, materialize_source
+from generoo.manifest import OutputManifest
+from generoo.output import ArchiveWriter, DirectoryWriter, FileWriter, RecordingWriter
+from generoo.pipeline import run_pipeline
+from generoo.profiling import profiler, profile_formats, format_bytes
+from generoo.transformations import get_transformation, load_transformation_plugins, check_transformations, \
+    declares_transformations, allow_plugins
+from generoo.usage import VariableUsage, print_usage
+from generoo.validation import compile_prompts
+from generoo.utils import handle_prompt, render_template_to_directory, render_destination_path, is_valid_input, \
+    template_cache, template_scan, configuration_cache, plan_cache, source_cache, copy_modes, \
+    load_configuration_file, parse_configuration, overwrite_file, use_render_engine, use_stream_threshold
 
 generate_options = ['generate', 'gen', 'g']
+batch_options = ['batch', 'b']
+list_options = ['list', 'ls']
+serve_options = ['serve']
+watch_options = ['watch']
+variables_options = ['variables', 'vars']
+plan_options = ['plan']
+pack_options = ['pack']
 project_options = ['project', 'proj', 'pro', 'p']
-excluded_archetypal_directories = ['common', '__pycache__']
 archetype_default = f'{os.path.join(os.path.dirname(os.path.realpath(__file__)))}/archetypes'
 project_template_filename = 'project-template-config.json'
 template_filename = '-template-config.json'
+template_trees = {}
+
+
+class GenerationError(Exception):
+    """Raised when one or more templates could not be rendered."""
 
 
-def create_configuration_directory(args: argparse.Namespace, run_configuration: dict):
+def create_configuration_directory(args: argparse.Namespace, run_configuration: dict, writer=None):
     """
     When new projects are created, Generoo will add a configuration file to the root directory of the project. This
     configuration file can be used to prepopulate date in subsequent generoo generation tasks. See documentation on
     github for more information.
+
+    When an archive writer is given, the configuration file is added to the archive instead. A directory writer stages
+    the file until the project is committed. Progress goes to args.log, see log.
     """
-    print('Creating generoo configuration directory...')
+    log(args, 'Creating generoo configuration directory...')
     generoo_directory = f'{args.name}/.generoo'
+    import yaml
+    raw_run_configuration = yaml.safe_dump(run_configuration, indent=4, sort_keys=True)
+    if writer is not None and not isinstance(writer, DirectoryWriter):
+        writer.write(f'{generoo_directory}/run-configuration.yml', raw_run_configuration)
+        log(args, 'Successfully created generoo configuration directory.')
+        return
+    if os.path.isdir(generoo_directory):
+        log(args, 'Generoo configuration directory already exists.')
     try:
-        os.makedirs(generoo_directory)
-    except FileExistsError:
-        print('Generoo configuration directory already exists.')
-    run_configuration_file = open(f'{generoo_directory}/run-configuration.yml', 'w')
-    run_configuration_file.write(yaml.safe_dump(run_configuration, indent=4, sort_keys=True))
-    run_configuration_file.close()
-    print('Successfully created generoo configuration directory.')
+        with open(f'{generoo_directory}/run-configuration.yml') as run_configuration_file:
+            unchanged = run_configuration_file.read() == raw_run_configuration
+    except IOError:
+        unchanged = False
+    if not unchanged:
+        if writer is not None:
+            writer.write(f'{generoo_directory}/run-configuration.yml', raw_run_configuration)
+        else:
+            overwrite_file(f'{generoo_directory}/run-configuration.yml', raw_run_configuration)
+    log(args, 'Successfully created generoo configuration directory.')
+
+
+def log(args: argparse.Namespace, message: str):
+    """
+    Passes a progress message of a generation to args.log, which is print on the command line and whatever sink the
+    caller gave to generoo.generate, or drops it when args.log is None.
+    """
+    if args.log is not None:
+        args.log(message)
 
 
 def prompt_for_archetype() -> (str, str, str):
@@ -41,6 +90,7 @@ def prompt_for_archetype() -> (str, str, str):
 
     :return: language, framework, version entered by the user.
     """
+    from pick import pick
 
     language, _ = pick(get_languages(), "Please choose a language:")
     framework, _ = pick(get_framework(language), "Please choose a framework:")
@@ -49,30 +99,18 @@ def prompt_for_archetype() -> (str, str, str):
 
 
 def get_languages() -> list:
-    """Traverse templates directory to pull out all of the directories that represent languages. Ignore common.py."""
-    root = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'archetypes/')
-    return [subdirectory for subdirectory in os.listdir(root) if os.path.isdir(os.path.join(root, subdirectory))
-            and subdirectory not in excluded_archetypal_directories]
+    """List the languages in the archetype catalog."""
+    return sorted(load_catalog(archetype_default, template_cache.enabled)['languages'])
 
 
 def get_framework(language: str) -> list:
-    """
-    Traverse templates/{language} directory to pull out all of the directories that represent archetypes.
-    Ignore common.py.
-    """
-    root = os.path.join(os.path.dirname(os.path.realpath(__file__)), f'archetypes/{language}')
-    return [subdirectory for subdirectory in os.listdir(root) if os.path.isdir(os.path.join(root, subdirectory))
-            and subdirectory not in excluded_archetypal_directories]
+    """List the frameworks of the given language in the archetype catalog."""
+    return sorted(load_catalog(archetype_default, template_cache.enabled)['languages'][language])
 
 
 def get_versions(language: str, framework: str) -> list:
-    """
-    Traverse templates/{language}/{framework} directory to pull out all of the directories that represent versions.
-    Ignore common.py.
-    """
-    root = os.path.join(os.path.dirname(os.path.realpath(__file__)), f'archetypes/{language}/{framework}')
-    return [subdirectory for subdirectory in os.listdir(root) if os.path.isdir(os.path.join(root, subdirectory))
-            and subdirectory not in excluded_archetypal_directories]
+    """List the versions of the given language and framework in the archetype catalog."""
+    return sorted(load_catalog(archetype_default, template_cache.enabled)['languages'][language][framework])
 
 
 def get_generoo_config(args: argparse.Namespace) -> dict:
@@ -83,10 +121,8 @@ def get_generoo_config(args: argparse.Namespace) -> dict:
     :return:
     """
     if args.run_configuration:
-        configuration = open(args.run_configuration)
-    else:
-        configuration = open(f'{args.name}/.generoo/run-configuration.yml')
-    return yaml.safe_load(configuration.read())
+        return load_configuration_file(args.run_configuration)
+    return load_configuration_file(f'{args.name}/.generoo/run-configuration.yml')
 
 
 def full_scope_name(scope):
@@ -104,6 +140,14 @@ def get_template_configuration_metadata(args: argparse.Namespace) -> (str, str):
     If no directory is provided, then the directory where the configuration file is
     located will be used.
 
+    The template can also be a bundle made by the pack goal, which is opened in place of a directory. The configuration
+    then defaults to the one for the scope in the bundle.
+
+    The template can also be a ref of a local git repository, given as REPOSITORY@REF, or a tar or zip archive, which
+    is materialized into the source cache and used from there, see materialize_source. The configuration then defaults
+    to the one for the scope in the materialized directory, and a relative configuration that does not exist is looked
+    up in it.
+
     :param args:
     :return:
     """
@@ -111,7 +155,19 @@ def get_template_configuration_metadata(args: argparse.Namespace) -> (str, str):
     directory = args.template
     scope = args.scope
 
-    if directory == archetype_default:
+    if is_source(directory):
+        with profiler.phase('materialize_source'):
+            directory = materialize_source(directory) + os.sep
+        if not config:
+            config = f'{directory}{full_scope_name(scope)}{template_filename}'
+        elif not os.path.isabs(config) and not os.path.isfile(config):
+            config = os.path.join(directory, config)
+    elif directory is not None and os.path.isfile(directory) and is_bundle(directory):
+        open_bundle(directory)
+        directory = os.path.normpath(directory) + os.sep
+        if not config:
+            config = f'{directory}{full_scope_name(scope)}{template_filename}'
+    elif directory == archetype_default:
         language, framework, version = prompt_for_archetype()
         directory = f'{directory}/{language}/{framework}/{version}/'
         if not config:
@@ -141,7 +197,8 @@ def resolve_variables(template_configuration: dict) -> dict:
     return run_configuration
 
 
-def process_follow_ups(prompt_response: str, prompt: dict, run_configuration: dict, auto_configure: bool):
+def process_follow_ups(prompt_response: str, prompt: dict, run_configuration: dict, auto_configure: bool,
+                       prompter=handle_prompt, used: set = None):
     """
     Recursively handles follow up prompts.
 
@@ -152,18 +209,21 @@ def process_follow_ups(prompt_response: str, prompt: dict, run_configuration: di
     :param prompt:
     :param run_configuration:
     :param auto_configure:
+    :param prompter:
+    :param used: see resolve_transformations.
     :return:
     """
     follow_ups = prompt.get('follow_ups')
     if follow_ups:
         for follow_up in follow_ups:
-            conditions = follow_up.get('conditions')
+            conditions = follow_up.get('compiled_conditions') or follow_up.get('conditions')
             if conditions:
                 if is_valid_input(prompt_response, conditions):
-                    process_prompt(follow_up, run_configuration, auto_configure)
+                    process_prompt(follow_up, run_configuration, auto_configure, prompter, used)
 
 
-def resolve_prompts(run_configuration: dict, template_configuration: dict, auto_configure: bool) -> dict:
+def resolve_prompts(run_configuration: dict, template_configuration: dict, auto_configure: bool,
+                    prompter=handle_prompt, used: set = None) -> dict:
     """
     The second step of the lifecycle is to collect the user inputs via the prompts. The values will also be written to
     the run configuration.
@@ -171,19 +231,21 @@ def resolve_prompts(run_configuration: dict, template_configuration: dict, auto_
     :param run_configuration:
     :param template_configuration:
     :param auto_configure:
+    :param prompter: callable that takes a prompt and returns the user's answer to it.
+    :param used: see resolve_transformations.
     :return:
     """
     prompts = template_configuration['prompts']
     if prompts:
         for prompt in prompts:
             if prompt['name'] and prompt['text']:
-                process_prompt(prompt, run_configuration, auto_configure)
+                process_prompt(prompt, run_configuration, auto_configure, prompter, used)
             else:
                 raise AttributeError
     return run_configuration
 
 
-def process_prompt(prompt, run_configuration, auto_configure):
+def process_prompt(prompt, run_configuration, auto_configure, prompter=handle_prompt, used: set = None):
     """
     Processes a prompt for a user.
 
@@ -200,56 +262,48 @@ def process_prompt(prompt, run_configuration, auto_configure):
     :param prompt:
     :param run_configuration:
     :param auto_configure:
+    :param prompter:
+    :param used: see resolve_transformations.
     :return:
     """
     override = prompt.get('override')
     if auto_configure and override:
         value = prompt['default']
     else:
-        value = handle_prompt(prompt)
+        value = prompter(prompt)
     name = prompt['name']
     run_configuration[name] = value
-    resolve_transformations(name, prompt.get('transformations'), run_configuration)
-    process_follow_ups(value, prompt, run_configuration, auto_configure)
+    resolve_transformations(name, prompt.get('transformations'), run_configuration, used)
+    process_follow_ups(value, prompt, run_configuration, auto_configure, prompter, used)
 
 
-def resolve_transformations(reference: str, transformations: dict, run_configuration: dict) -> dict:
+def resolve_transformations(reference: str, transformations: dict, run_configuration: dict, used: set = None) -> dict:
     """
     Prompts accept transformations, which are meant to take the input and then convert it to a different format.
 
-    The transformation types can be found below or in the README.
+    The transformation types are looked up in the transformation registry, see generoo.transformations. The built in
+    types can be found in the README.
+
+    Transformations are only computed when the templates refer to their name, when the names the templates refer to are
+    given as used, see used_names. They then neither take time nor end up in the saved run configuration otherwise.
 
     :param reference
     :param run_configuration:
     :param transformations:
+    :param used: the names the templates refer to, or None to compute every transformation.
     :return:
     """
     if transformations:
         for transformation in transformations:
-            name = transformation['name']
-            transformation_type = transformation['transformation']
-            if equals_ignore_case(transformation_type, 'SNAKE'):
-                run_configuration[name] = convert_to_snake(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'DASHES'):
-                run_configuration[name] = convert_to_dashes(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'SLASHES'):
-                run_configuration[name] = convert_to_slashes(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'PERIODS'):
-                run_configuration[name] = convert_to_periods(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'LOWER'):
-                run_configuration[name] = convert_to_lower_with_spaces(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'CAMEL'):
-                run_configuration[name] = convert_to_camel(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'CAPITALIZED'):
-                run_configuration[name] = convert_to_caps_no_spaces(run_configuration[reference])
-            elif equals_ignore_case(transformation_type, 'CAPITALIZED_WITH_SPACES'):
-                run_configuration[name] = convert_to_caps_with_spaces(run_configuration[reference])
-            else:
-                raise AttributeError(f'Did not recognize the transformation type provided: {transformation_type}')
+            if used is not None and transformation['name'] not in used:
+                continue
+            transform = get_transformation(transformation['transformation'])
+            run_configuration[transformation['name']] = transform(run_configuration[reference])
     return run_configuration
 
 
-def fill_in_templates(args: argparse.Namespace, template_path: str, template_configurations: dict, run_configurations: dict):
+def fill_in_templates(args: argparse.Namespace, template_path: str, template_configurations: dict, run_configurations: dict,
+                      writer=None):
     """
     Apply the run configuration to the templates in the provided template directory.
 
@@ -260,6 +314,37 @@ def fill_in_templates(args: argparse.Namespace, template_path: str, template_con
     If no mappings are provided, then the assumption is that the provided template directory is structured in the way
     the output should be structured, and all replacements will happen in place with the given structure.
 
+    The templates of every mapping are planned as they are rendered and go through one pipeline, so that with --jobs
+    they share one worker pool, see fill_templates. Files whose inputs are unchanged since the previous generation are skipped, see OutputManifest.
+
+    :param args:
+    :param template_path:
+    :param template_configurations:
+    :param run_configurations:
+    :param writer: an archive writer to stream the files into, or a directory writer to stage them in.
+    :return: the totals of fill_templates, with the number of files skipped as unchanged.
+    """
+    jobs = plan_project(args, template_path, template_configurations, run_configurations)
+    if isinstance(writer, ArchiveWriter):
+        totals = fill_templates(args, jobs, run_configurations, writer=writer)
+        totals['skipped'] = 0
+        return totals
+    manifest = OutputManifest(args.name, run_configurations).load()
+    try:
+        totals = fill_templates(args, jobs, run_configurations, manifest, writer)
+    finally:
+        manifest.save(writer)
+    manifest.report(args.log)
+    totals['skipped'] = manifest.counts()['skipped']
+    return totals
+
+
+def plan_templates(args: argparse.Namespace, template_path: str, template_configurations: dict,
+                   run_configurations: dict):
+    """
+    Plans the jobs of every mapping, or of the template directory, lazily, so that the templates of a huge tree are
+    planned while the first ones are already being rendered. See fill_in_templates.
+
     :param args:
     :param template_path:
     :param template_configurations:
@@ -272,22 +357,261 @@ def fill_in_templates(args: argparse.Namespace, template_path: str, template_con
             template = mapping['template']
             destination = mapping['destination']
             if template and destination:
-                if os.path.isdir(template):
+                if is_template_directory(template):
                     if os.path.isdir(destination):
-                        recursively_fill_template_in_dir(args, template, destination, run_configurations)
+                        yield from iterate_template_dir(args, template, destination, run_configurations)
                     else:
                         raise AttributeError(f'{template} is a directory. {destination} must be a directory.')
                 else:
                     os.makedirs(template_path, exist_ok=True)
-                    render_template_to_directory(render_destination_path(destination, run_configurations), os.path.join(template_path, template), run_configurations)
+                    yield (os.path.join(template_path, template), render_destination_path(destination, run_configurations),
+                           None)
     else:
-        if os.path.isdir(template_path):
-            recursively_fill_template_in_dir(args, template_path, os.curdir, run_configurations)
+        if is_template_directory(template_path):
+            yield from iterate_template_dir(args, template_path, os.curdir, run_configurations)
+        else:
+            yield (template_path, render_destination_path(os.path.join(args.name, os.path.basename(template_path)),
+                                                          run_configurations), None)
+
+
+class GenerationPlan:
+    """
+    The plan of a generation: a job for every file, with its template, its destination and the path reported for it, and
+    the conditions of its path resolved, see collect_template_dir. A plan that does not come from the plan cache is
+    planned as it is iterated over, see plan_templates.
+    """
+
+    def __init__(self, jobs, cached: bool):
+        self.jobs = jobs
+        self.cached = cached
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+
+def plan_project(args: argparse.Namespace, template_path: str, template_configurations: dict,
+                 run_configurations: dict) -> GenerationPlan:
+    """
+    Plans the project through the plan cache, see PlanCache. The plan of a template tree only depends on the names of
+    its files and directories and the values of the run configuration its paths refer to, so a project generated again
+    with the same values takes its plan from the cache, without walking the template tree or rendering any path.
+    Otherwise the jobs of plan_templates are stored in the cache once they have all been planned, relative to the
+    template tree and the project, see portable_job, so that every project generated from the tree shares its plans.
+
+    :param args:
+    :param template_path:
+    :param template_configurations:
+    :param run_configurations:
+    :return:
+    """
+    # A project name with tags is rendered with the paths, so its plans could not be shared.
+    if not plan_cache.enabled or '{{' in args.name:
+        return GenerationPlan(plan_templates(args, template_path, template_configurations, run_configurations), False)
+    key = plan_key(template_path, template_configurations)
+    entry = plan_cache.load(key)
+    if entry is None:
+        fingerprint, names = template_tree_state(template_path, template_configurations)
+        entry = {'fingerprint': fingerprint, 'names': names, 'plans': {}}
+    values = plan_values(entry['names'], run_configurations)
+    jobs = entry['plans'].get(values)
+    if jobs is not None:
+        return GenerationPlan([project_job(args, template_path, job) for job in jobs], True)
+    jobs = plan_templates(args, template_path, template_configurations, run_configurations)
+    mapped = bool(template_configurations.get('mappings'))
+    return GenerationPlan(record_plan(jobs, lambda planned: plan_cache.store(
+        key, entry, values, [portable_job(args, template_path, mapped, job) for job in planned])), False)
+
+
+def record_plan(jobs, store):
+    """Passes the jobs through, and stores all of them with store once the last one has been planned."""
+    planned = []
+    for job in jobs:
+        planned.append(job)
+        yield job
+    store(planned)
+
+
+def plan_key(template_path: str, template_configurations: dict) -> str:
+    """
+    Keys the plans of a template tree by everything they depend on besides the run configuration: where the template
+    tree is and its mappings, whose template directories are relative to the working directory.
+    """
+    mappings = [dict(mapping, template=os.path.abspath(mapping['template'])) if mapping.get('template') else mapping
+                for mapping in template_configurations.get('mappings') or []]
+    key = (os.path.abspath(template_path), mappings)
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def portable_job(args: argparse.Namespace, template_path: str, mapped: bool, job: tuple) -> tuple:
+    """
+    Returns a job as it is kept in the plan cache: its template relative to the template tree, and its destination and
+    reported path relative to the project. The destination of a mapped template, the only job of a mapping that is not
+    reported, is relative to the working directory instead and kept as it is. See project_job.
+
+    :param args:
+    :param template_path:
+    :param mapped: whether the template configuration has mappings.
+    :param job:
+    :return:
+    """
+    template, destination, reported = job
+    template = os.path.relpath(os.path.abspath(template), os.path.abspath(template_path))
+    if mapped and reported is None:
+        return template, destination, reported, False
+    project = len(os.path.join(args.name, ''))
+    return template, destination[project:], reported[project:] if reported else reported, True
+
+
+def project_job(args: argparse.Namespace, template_path: str, job: tuple) -> tuple:
+    """Returns the job of the project from a job kept in the plan cache, see portable_job."""
+    template, destination, reported, in_project = job
+    template = os.path.normpath(os.path.join(template_path, template))
+    if not in_project:
+        return template, destination, reported
+    return template, os.path.join(args.name, destination), os.path.join(args.name, reported) if reported else reported
+
+
+def plan_values(names: list, run_configurations: dict) -> str:
+    """Keys a plan by the values of the names the paths of the template tree refer to."""
+    values = [(name, name in run_configurations, run_configurations.get(name)) for name in names]
+    return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+
+
+def template_tree_state(template_path: str, template_configurations: dict) -> (dict, list):
+    """
+    Returns the modification time of every directory of the template trees the plan walks, or of their bundle, and the
+    names their files, directories and destinations refer to. Directories are timed before they are listed, so that a
+    change while they are listed makes the plan stale rather than wrong.
+
+    :param template_path:
+    :param template_configurations:
+    :return:
+    """
+    fingerprint = {}
+    usage = VariableUsage()
+
+    def add_tree(directory):
+        bundle, _ = find_bundle(directory.path)
+        if bundle is None:
+            fingerprint[os.path.abspath(directory.path)] = os.stat(directory.path).st_mtime_ns
         else:
-            render_template_to_directory(os.path.join(args.name, os.path.basename(template_path)), template_path, run_configurations)
+            fingerprint[os.path.abspath(bundle.path)] = os.stat(bundle.path).st_mtime_ns
+        directories, files = directory.list()
+        for subdirectory in directories:
+            usage.add_path(subdirectory.name)
+            add_tree(subdirectory)
+        for file in files:
+            usage.add_path(file)
+
+    mappings = template_configurations.get('mappings')
+    if mappings:
+        for mapping in mappings:
+            if mapping['template'] and mapping['destination']:
+                usage.add_path(mapping['destination'])
+                if is_template_directory(mapping['template']):
+                    add_tree(scan_template_dir(mapping['template']))
+    elif is_template_directory(template_path):
+        add_tree(scan_template_dir(template_path))
+    else:
+        usage.add_path(os.path.basename(template_path))
+    return fingerprint, sorted(usage.names)
+
+
+def print_plan(args: argparse.Namespace):
+    """
+    Prints the plan of the project, the template and destination of every file, without generating it. Prompts take
+    their values from the run configuration given with --run-configuration or saved in the project, and their defaults
+    otherwise, as in batch runs.
+
+    The plan only depends on the names the paths refer to, so a prompt without an answer or default is left empty
+    unless a path refers to it or one of its transformations. Those are reported instead of a plan.
+
+    :param args:
+    :return:
+    """
+    from generoo.batch import default_prompter
+    template_directory, template_file = get_template_configuration_metadata(args)
+    template_configuration = load_template_configuration(template_file)
+    try:
+        answers = get_generoo_config(args) or {}
+    except IOError:
+        answers = {}
+    path_names = set(template_tree_state(template_directory, template_configuration)[1])
+    missing = []
+
+    def prompter(prompt):
+        try:
+            return default_prompter(prompt)
+        except AttributeError:
+            transformations = prompt.get('transformations') or []
+            names = {prompt['name']} | {transformation['name'] for transformation in transformations}
+            if names & path_names:
+                missing.append(prompt['name'])
+            return False if prompt.get('type') == 'BOOL' else ''
+
+    used = used_names(template_directory, template_configuration)
+    run_configuration = extract_run_configuration(override_defaults(template_configuration, answers), True, prompter,
+                                                  used)
+    if missing:
+        print(f'Cannot plan {args.name} without answers to {", ".join(missing)}, which paths refer to. Give them with '
+              f'--run-configuration.', file=sys.stderr)
+        sys.exit(1)
+    start = time.perf_counter()
+    plan = plan_project(args, template_directory, template_configuration, run_configuration)
+    jobs = list(plan)
+    seconds = time.perf_counter() - start
+    for template, destination, _ in jobs:
+        print(f'{template} -> {destination}')
+    print(f'Planned {len(jobs)} files in {seconds * 1000:.1f} ms{", from the plan cache" if plan.cached else ""}.')
+
+
+def scan_variables(template_path: str, template_configurations: dict) -> VariableUsage:
+    """
+    Collects the names every template and path of the template directory, or of the mappings, refers to, whatever the
+    answers to the prompts. Unlike plan_templates, directories are not pruned by their conditions. The names of a
+    template are kept by its content hash, see TemplateScan.names.
+
+    :param template_path:
+    :param template_configurations:
+    :return:
+    """
+    usage = VariableUsage()
+    mappings = template_configurations.get('mappings')
+    if mappings:
+        for mapping in mappings:
+            template = mapping['template']
+            destination = mapping['destination']
+            if template and destination:
+                usage.add_path(destination)
+                if is_template_directory(template):
+                    usage.add_tree(scan_template_dir(template))
+                else:
+                    usage.add_template(os.path.join(template_path, template))
+    elif is_template_directory(template_path):
+        usage.add_tree(scan_template_dir(template_path))
+    else:
+        usage.add_path(os.path.basename(template_path))
+        usage.add_template(template_path)
+    return usage
 
 
-def recursively_fill_template_in_dir(args: argparse.Namespace, template_dir: str, destination: str, run_configurations: dict):
+def used_names(template_path: str, template_configurations: dict) -> set:
+    """
+    Returns the names the templates and their paths refer to, see scan_variables, or None when the template
+    configuration declares no transformations, the only values that are left out for names nothing refers to.
+
+    :param template_path:
+    :param template_configurations:
+    :return:
+    """
+    if not declares_transformations(template_configurations.get('prompts')):
+        return None
+    with profiler.phase('scan_variables'):
+        return scan_variables(template_path, template_configurations).names
+
+
+def recursively_fill_template_in_dir(args: argparse.Namespace, template_dir: str, destination: str, run_configurations: dict,
+                                     writer=None):
     """
     Walk the non-flat template directory and render both the template content as well as the destination path.
 
@@ -295,17 +619,196 @@ def recursively_fill_template_in_dir(args: argparse.Namespace, template_dir: str
     :param template_dir:
     :param destination:
     :param run_configurations:
+    :param writer: an archive writer to stream the files into instead of writing them to disk.
+    :return:
+    """
+    fill_templates(args, collect_template_dir(args, template_dir, destination, run_configurations), run_configurations,
+                   writer=writer)
+
+
+def collect_template_dir(args: argparse.Namespace, template_dir: str, destination: str, run_configurations: dict) -> list:
+    """
+    Walk the non-flat template directory and collect a render job for every template in it.
+
+    A job is a tuple of the template path, the rendered destination path and the path reported for it, the destination
+    with its section conditions removed but not yet rendered, or None when the job is not reported.
+
+    Section conditions are evaluated and names rendered once per directory, on the way down, and every file of the
+    directory reuses its rendered path. A directory whose conditions are not met is skipped with everything in it,
+    without being listed. Jobs are collected in the order of a bottom up walk, every directory after its subdirectories.
+
+    :param args:
+    :param template_dir:
+    :param destination:
+    :param run_configurations:
+    :return:
+    """
+    return list(iterate_template_dir(args, template_dir, destination, run_configurations))
+
+
+def iterate_template_dir(args: argparse.Namespace, template_dir: str, destination: str, run_configurations: dict):
+    """Yields the jobs of collect_template_dir one at a time, walking the template directory as they are consumed."""
+    reported, passes = evaluate_filepath_conditions(os.path.join(args.name, destination), run_configurations)
+    if passes:
+        yield from iterate_directory(scan_template_dir(template_dir), reported,
+                                     render_destination_path(reported, run_configurations), run_configurations)
+
+
+def iterate_directory(directory, reported: str, rendered: str, run_configurations: dict):
+    directories, files = directory.list()
+    for subdirectory in directories:
+        name, rendered_name = evaluate_name(subdirectory.name, run_configurations)
+        if name is not None:
+            yield from iterate_directory(subdirectory, os.path.join(reported, name),
+                                         os.path.join(rendered, rendered_name), run_configurations)
+    for file in files:
+        name, rendered_name = evaluate_name(file, run_configurations)
+        if name is not None:
+            yield (os.path.join(directory.path, file), os.path.join(rendered, rendered_name),
+                   os.path.join(reported, name))
+
+
+def evaluate_name(name: str, run_configurations: dict) -> (str, str):
+    """
+    Evaluates the section conditions of a single file or directory name. Returns the name without its conditions and
+    the rendered name, or None twice when a condition is not met.
+    """
+    if '{{' not in name:
+        return name, name
+    name, passes = evaluate_filepath_conditions(name, run_configurations)
+    if not passes:
+        return None, None
+    return name, render_destination_path(name, run_configurations)
+
+
+class TemplateDirectory:
+    """
+    A directory of a template tree. Its subdirectories and files are only listed the first time a generation walks into
+    it and are kept for the rest of the process, so that generating several projects from the same templates lists
+    every directory once, and a directory that is always pruned by its conditions is never listed at all.
+    """
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.listing = None
+
+    def list(self) -> (list, list):
+        """Returns the subdirectories, in the order os.walk visits them, and the sorted names of the files."""
+        listing = self.listing
+        if listing is None:
+            bundle, relative = find_bundle(self.path)
+            if bundle is not None:
+                directories, files = bundle.list(relative)
+                listing = self.listing = ([TemplateDirectory(os.path.join(self.path, name), name) for name in directories],
+                                          files)
+                return listing
+            directories = []
+            files = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, symbolic links to directories are not followed.
+                        if not entry.is_symlink():
+                            directories.append(TemplateDirectory(os.path.join(self.path, entry.name), entry.name))
+                    else:
+                        files.append(entry.name)
+            listing = self.listing = (directories, sorted(files))
+        return listing
+
+
+def scan_template_dir(template_dir: str) -> TemplateDirectory:
+    """
+    Returns the root of the template tree of the template directory, which is kept for the rest of the process.
+
+    :param template_dir:
+    :return:
+    """
+    tree = template_trees.get(template_dir)
+    if tree is None:
+        tree = template_trees[template_dir] = TemplateDirectory(template_dir, os.path.basename(template_dir))
+    return tree
+
+
+def fill_templates(args: argparse.Namespace, jobs: list, run_configurations: dict, manifest: OutputManifest = None,
+                   writer=None):
+    """
+    Renders the jobs and writes the files, see run_pipeline. With args.jobs above one, templates are rendered by a pool of
+    threads while a single writer thread writes the rendered files, and the jobs are planned as they are needed.
+
+    Files are written and reported in the order the jobs were planned regardless of the number of threads. A failing
+    template does not stop the others; every failure is reported once all jobs have finished. The number of files and
+    bytes written per second is reported at the end. Reports go to args.log, see log.
+
+    :param args:
+    :param jobs: a list or iterable of jobs, see collect_template_dir.
+    :param run_configurations:
+    :param manifest: when given, unchanged files are skipped and every file is recorded in it.
+    :param writer: an archive writer to stream the files into, or a directory writer to stage them in.
+    :return: the number of jobs, the paths of the files written in the order they were written, the number of bytes
+        written and the seconds it took.
+    """
+    output = writer if writer is not None else FileWriter()
+    failures = []
+    totals = {'jobs': 0, 'files': [], 'bytes': 0}
+
+    def render(job):
+        recorder = RecordingWriter()
+        try:
+            with profiler.template(job[0]):
+                reported = fill_template(job, run_configurations, manifest, args.copy_mode, recorder)
+            return reported, recorder, None
+        except Exception as e:
+            return None, None, e
+
+    def write(job, result):
+        reported, recorder, error = result
+        totals['jobs'] += 1
+        if error is not None:
+            failures.append(f'{job[0]}: {type(error).__name__}: {error}')
+            return
+        with profiler.template(job[0]):
+            recorder.replay(output)
+        totals['files'].extend(operation[0] for operation in recorder.operations)
+        totals['bytes'] += recorder.size
+        if reported is not None:
+            log(args, reported)
+
+    start = time.perf_counter()
+    run_pipeline(jobs, render, write, max(1, args.jobs))
+    if failures:
+        raise GenerationError(f'Failed to render {len(failures)} of {totals["jobs"]} templates:\n' + '\n'.join(failures))
+    totals['seconds'] = time.perf_counter() - start
+    if args.log is not None:
+        print_throughput(len(totals['files']), totals['bytes'], totals['seconds'], args.log)
+    return totals
+
+
+def print_throughput(files: int, size: int, seconds: float, log=print):
+    seconds = max(seconds, 1e-9)
+    log(f'Wrote {files} files, {format_bytes(size)}, in {seconds:.2f} s: {files / seconds:.0f} files/s, '
+        f'{size / seconds / 1024 / 1024:.2f} MB/s')
+
+
+def fill_template(job: tuple, run_configurations: dict, manifest: OutputManifest = None, copy_mode: str = 'copy',
+                  writer=None):
+    """
+    Renders a single job, see collect_template_dir. Returns the destination reported for the job, or None when it is not
+    reported.
+
+    :param job:
+    :param run_configurations:
+    :param manifest:
+    :param copy_mode: how templates without tags are copied, see copy_file.
+    :param writer: writes the file instead of it being written to disk.
     :return:
     """
-    template_dir_len = len(template_dir)
-    for root, dirs, files in os.walk(template_dir, topdown=False):
-        for name in files:
-            file_destination = os.path.join(args.name, destination, root[template_dir_len:], name)
-            if len(file_destination) > 0:
-                file_destination, passes = evaluate_filepath_conditions(file_destination, run_configurations)
-                if passes:
-                    print(file_destination)
-                    render_template_to_directory(render_destination_path(file_destination, run_configurations), os.path.join(root, name), run_configurations)
+    template, destination, reported = job
+    if manifest is None:
+        render_template_to_directory(destination, template, run_configurations, copy_mode, writer)
+    else:
+        manifest.fill(destination, template, run_configurations, copy_mode, writer)
+    return reported
 
 
 def evaluate_filepath_conditions(file_destination: str, run_configurations: dict) -> (str, bool):
@@ -339,16 +842,19 @@ def evaluate_filepath_conditions(file_destination: str, run_configurations: dict
     return file_destination, True
 
 
-def extract_run_configuration(template_configuration: dict, auto_configure: bool) -> dict:
+def extract_run_configuration(template_configuration: dict, auto_configure: bool, prompter=handle_prompt,
+                              used: set = None) -> dict:
     """
     Runs the lifecycle events for loading the template file. Returns a run configuration.
 
     :param template_configuration:
     :param auto_configure:
+    :param prompter:
+    :param used: see resolve_transformations.
     :return:
     """
     run_configuration = resolve_variables(template_configuration)
-    run_configuration = resolve_prompts(run_configuration, template_configuration, auto_configure)
+    run_configuration = resolve_prompts(run_configuration, template_configuration, auto_configure, prompter, used)
     return run_configuration
 
 
@@ -370,7 +876,8 @@ def override_defaults(template_configuration, run_configuration):
 
 def override_default(prompt, run_configuration):
     """
-    Replaces the default value of the given prompt with its value from the run configuration, if present.
+    Replaces the default value of the given prompt with its value from the run configuration, if present. Follow ups
+    are overridden whether or not their prompt is, so that their answers apply on top of the prompt's default.
 
     :param prompt:
     :param run_configuration:
@@ -379,78 +886,306 @@ def override_default(prompt, run_configuration):
     if prompt['name'] in run_configuration:
         prompt['default'] = run_configuration[prompt['name']]
         prompt['override'] = True
-        follow_ups = prompt.get('follow_ups')
-        if follow_ups:
-            for follow_up in follow_ups:
-                override_default(follow_up, run_configuration)
+    follow_ups = prompt.get('follow_ups')
+    if follow_ups:
+        for follow_up in follow_ups:
+            override_default(follow_up, run_configuration)
 
 
 def load_template_configuration(template_file) -> dict:
     """
     Opens the template file in YAML or JSON format and loads it into a python dict.
 
+    Transformation plugins listed by the configuration are loaded, every transformation it uses is checked and every
+    validation and follow up condition is compiled. The compiled configuration is cached by the hash of the file, so an
+    unchanged configuration is not parsed or compiled again.
+
     Will raise an error if any of the steps fail.
 
     :param template_file:
     :return:
     """
-    raw_configuration = open(template_file)
-    template_configuration = yaml.safe_load(raw_configuration.read())
-    raw_configuration.close()
+    raw = read_bytes(template_file)
+    key = hashlib.sha1(raw).hexdigest()
+    template_configuration = configuration_cache.load(key)
+    if template_configuration is None:
+        template_configuration = parse_configuration(raw.decode('utf-8'), template_file)
+        load_transformation_plugins(template_configuration, os.path.dirname(template_file))
+        check_transformations(template_configuration.get('prompts'))
+        compile_prompts(template_configuration.get('prompts'))
+        configuration_cache.store(key, template_configuration)
+    else:
+        load_transformation_plugins(template_configuration, os.path.dirname(template_file))
+        check_transformations(template_configuration.get('prompts'))
     return template_configuration
 
 
 def generate_project(args: argparse.Namespace):
     """
-    Generates a project based on the command line arguments given.
+    Generates a project based on the command line arguments given. Prompts are asked on the terminal, with the values of
+    the run configuration saved in the project, if any, as their defaults, see generate_run.
     :param args:
     :return:
     """
     template_directory, template_file = get_template_configuration_metadata(args)
-    template_configuration = load_template_configuration(template_file)
-    try:
-        if not args.no_config:
-            run_configuration = get_generoo_config(args)
-            template_configuration = override_defaults(template_configuration, run_configuration)
-        run_configuration = extract_run_configuration(template_configuration, args.auto_config)
-    except IOError:
-        run_configuration = extract_run_configuration(template_configuration, args.auto_config)
-    create_configuration_directory(args, run_configuration)
-    fill_in_templates(args, template_directory, template_configuration, run_configuration)
+    answers = {}
+    if not args.no_config:
+        try:
+            answers = get_generoo_config(args) or {}
+        except IOError:
+            pass
+    generate_run(args, template_directory, template_file, answers, handle_prompt, args.auto_config)
+    template_cache.evict()
+    configuration_cache.evict()
+    plan_cache.evict()
+    source_cache.evict()
+    template_scan.save()
+    plan_cache.save()
+
+
+class GenerationResult:
+    """
+    What a generation did: the project it generated, or the archive it streamed the project into, the run configuration
+    it used, the files it wrote in the order it wrote them, the number of bytes written, the number of files skipped as
+    unchanged since the previous generation, see OutputManifest, and the seconds each phase took.
+    """
+
+    def __init__(self, project: str, archive: str, run_configuration: dict, files: list, size: int, skipped: int,
+                 timings: dict):
+        self.project = project
+        self.archive = archive
+        self.run_configuration = run_configuration
+        self.files = files
+        self.size = size
+        self.skipped = skipped
+        self.timings = timings
+
+    def __repr__(self):
+        return f'<GenerationResult {self.archive or self.project}: {len(self.files)} files, {self.size} bytes>'
+
+
+def generate_run(args: argparse.Namespace, template_directory: str, template_file: str, answers: dict,
+                 prompter=handle_prompt, auto_configure: bool = True) -> GenerationResult:
+    """
+    Generates the project of a resolved template directory and configuration, for the command line and for
+    generoo.generate alike.
+
+    The answers are the defaults of their prompts, taken without asking with auto_configure, see override_defaults.
+    Every other prompt is asked to the prompter. Progress goes to args.log, see log.
+
+    :param args:
+    :param template_directory:
+    :param template_file:
+    :param answers: values of prompts, as in a run configuration.
+    :param prompter: callable that takes a prompt and returns the answer to it.
+    :param auto_configure:
+    :return:
+    """
+    timings = {}
+    start = time.perf_counter()
+    with profiler.phase('load_template_configuration'):
+        template_configuration = load_template_configuration(template_file)
+        used = used_names(template_directory, template_configuration)
+    timings['configuration'] = time.perf_counter() - start
+    with profiler.phase('extract_run_configuration'):
+        if answers:
+            template_configuration = override_defaults(template_configuration, answers)
+        run_configuration = extract_run_configuration(template_configuration, auto_configure, prompter, used)
+    timings['prompts'] = time.perf_counter() - start - timings['configuration']
+    totals = render_project(args, template_directory, template_configuration, run_configuration)
+    timings['render'] = time.perf_counter() - start - timings['configuration'] - timings['prompts']
+    timings['total'] = time.perf_counter() - start
+    return GenerationResult(args.name, args.output_archive, run_configuration, totals['files'], totals['bytes'],
+                            totals['skipped'], timings)
+
+
+def render_project(args: argparse.Namespace, template_directory: str, template_configuration: dict,
+                   run_configuration: dict, writer=None):
+    """
+    Writes the configuration directory and fills in the templates of a project whose run configuration is resolved.
+
+    With --output-archive the project is streamed into the archive instead of being written to disk. An already open
+    writer can be passed in to add several projects to the same archive.
+
+    Otherwise the project is staged by a DirectoryWriter and only committed once every template has been rendered, so a
+    failed generation leaves no partially written project behind.
+
+    :param args:
+    :param template_directory:
+    :param template_configuration:
+    :param run_configuration:
+    :param writer:
+    :return: the totals of fill_in_templates.
+    """
+    if writer is None and args.output_archive:
+        writer = ArchiveWriter(args.output_archive)
+        try:
+            return render_project(args, template_directory, template_configuration, run_configuration, writer)
+        finally:
+            writer.close()
+    if writer is None:
+        writer = DirectoryWriter(args.name, args.fsync)
+        try:
+            totals = render_project(args, template_directory, template_configuration, run_configuration, writer)
+            with profiler.phase('commit'):
+                writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        return totals
+    with profiler.phase('create_configuration_directory'):
+        create_configuration_directory(args, run_configuration, writer)
+    with profiler.phase('fill_in_templates'):
+        return fill_in_templates(args, template_directory, template_configuration, run_configuration, writer)
 
 
 def run(args: argparse.Namespace):
+    if args.profile or args.profile_dump:
+        profiler.start(cprofile=args.profile_dump is not None)
+        try:
+            return run_output(args)
+        finally:
+            profiler.stop()
+            profiler.print_report(args.profile or 'table')
+            if args.profile_dump:
+                profiler.dump_stats(args.profile_dump)
+    return run_output(args)
+
+
+def run_output(args: argparse.Namespace):
+    if args.output_archive == '-':
+        # The archive goes to stdout, so everything generoo prints goes to stderr instead.
+        with redirect_stdout(sys.stderr):
+            return run_goal(args)
+    return run_goal(args)
+
+
+def run_goal(args: argparse.Namespace):
+    template_cache.enabled = not args.no_cache
+    template_scan.enabled = not args.no_cache
+    configuration_cache.enabled = not args.no_cache
+    plan_cache.enabled = not args.no_cache
+    source_cache.enabled = not args.no_cache
+    use_render_engine(args.render_engine)
+    allow_plugins(args.allow_plugins)
+    use_stream_threshold(args.stream_threshold)
     if args.goal in generate_options:
         if args.scope in project_options:
             generate_project(args)
+    elif args.goal in list_options:
+        print_catalog(load_catalog(archetype_default, template_cache.enabled))
+        template_scan.save()
+    elif args.goal in batch_options:
+        if args.scope in project_options:
+            from generoo.batch import generate_batch
+            generate_batch(args)
+    elif args.goal in pack_options:
+        index = pack_bundle(args.scope, args.name)
+        print(f'Packed {len(index["files"])} files from {args.scope} into {args.name}.')
+    elif args.goal in serve_options:
+        from generoo.serve import serve
+        serve(args)
+    elif args.goal in watch_options:
+        if args.scope in project_options:
+            from generoo.watch import watch
+            watch(args)
+    elif args.goal in plan_options:
+        if args.scope in project_options:
+            print_plan(args)
+            template_scan.save()
+            plan_cache.save()
+    elif args.goal in variables_options:
+        if args.scope in project_options:
+            template_directory, template_file = get_template_configuration_metadata(args)
+            template_configuration = load_template_configuration(template_file)
+            print_usage(scan_variables(template_directory, template_configuration), template_configuration,
+                        template_directory)
+            template_scan.save()
 
 
-def generoo():
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='Generate code from templates.')
 
     # Positional Arguments
-    parser.add_argument('goal', help='A generator goal. Examples: generate, config')
-    parser.add_argument('scope', help='A generator scope. Examples: project, resource')
-    parser.add_argument('name', help='The name for the scope. Example: test, pet, inventory')
+    parser.add_argument('goal', help='A generator goal. Examples: generate, batch, list, serve, pack, watch, '
+                                     'variables, plan')
+    parser.add_argument('scope', nargs='?', help='A generator scope, or the template directory for the pack goal. '
+                                                 'Examples: project, resource')
+    parser.add_argument('name', nargs='?', help='The name for the scope, the manifest file for the batch goal or the '
+                                                'bundle file for the pack goal. Example: test, pet, inventory')
 
     # Flag Arguments
+    parser.add_argument('--version', action='version', version=f'generoo {version}')
     parser.add_argument('-n', '--no-config', action='store_true',
                         help='Will run generoo without a pre-existing configuration.')
     parser.add_argument('-a', '--auto-config', action='store_true',
                         help='Will run generoo using the pre-existing configuration'
                              'and only prompt for values not present in the configuration.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of threads used to render and write templates, or to generate projects with '
+                             'the batch goal. Defaults to 1.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Will run generoo without reading or writing the parsed template, template scan, '
+                             'configuration, plan and template source caches.')
+    parser.add_argument('-o', '--output-archive',
+                        help='Streams the generated project into a .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .zip archive '
+                             'instead of writing it to disk. - streams a .tar.gz to stdout.')
+    parser.add_argument('--fsync', action='store_true',
+                        help='Flushes every generated file to disk before the project is committed.')
+    parser.add_argument('--copy-mode', choices=copy_modes, default='copy',
+                        help='How templates without any Mustache tags are copied to the destination. Defaults to copy.')
+    parser.add_argument('--stream-threshold', type=int, default=default_stream_threshold, metavar='BYTES',
+                        help='Size in bytes from which templates are rendered and written in chunks instead of being '
+                             'read whole. Defaults to 32 MB.')
+    parser.add_argument('--render-engine', choices=render_engine_names, default='compiled',
+                        help='How templates are rendered: compiled to Python functions, or by pystache\'s renderer. '
+                             'Defaults to compiled.')
+
+    parser.add_argument('--profile', nargs='?', const='table', choices=profile_formats,
+                        help='Reports the time spent per phase and per template, the bytes read and written and the '
+                             'peak memory on stderr, as a table or as json. Defaults to table.')
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help='Runs generoo under cProfile and writes the statistics to the file, for pstats.')
+
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='The address the serve goal listens on. Defaults to 127.0.0.1.')
+    parser.add_argument('--port', type=int, default=8080, help='The port the serve goal listens on. Defaults to 8080.')
+    parser.add_argument('--socket', help='A Unix socket for the serve goal to listen on instead of a port.')
+    parser.add_argument('--workers', type=int,
+                        help='Number of projects the serve goal generates at a time. Defaults to the number of CPUs.')
+    parser.add_argument('--allow-plugins', action='store_true',
+                        help='Runs the transformation plugins of bundles and of templates from git repositories or '
+                             'archives, which are never run otherwise.')
+    parser.add_argument('--poll', action='store_true',
+                        help='Makes the watch goal poll the templates for changes instead of using inotify.')
 
     # Keyword Arguments
     parser.add_argument('-c', '--template-config',
                         help='Points to a location on the system that contains a custom template config.')
     parser.add_argument('-t', '--template', default=archetype_default,
                         help='Points to a directory on the system that contains templates for a corresponding '
-                             'template config')
+                             'template config, to a bundle made by the pack goal, to a tar or zip archive of such a '
+                             'directory or to a ref of a local git repository of one, as REPOSITORY@REF')
     parser.add_argument('-r', '--run-configuration',
                         help='Points to a file on the system that contains a run configuration for a corresponding '
                              'template config')
+    # Where generations report their progress, see log. generoo.generate takes another sink.
+    parser.set_defaults(log=print)
 
+    return parser
+
+
+def generoo():
+    parser = build_parser()
     arguments = parser.parse_args()
+    if arguments.goal in watch_options and arguments.name is None:
+        # The only argument of generoo watch NAME is the name of the project, even when it reads like a scope, e.g. p.
+        arguments.scope, arguments.name = project_options[0], arguments.scope
+    if arguments.goal in variables_options and arguments.scope is None:
+        parser.error('the following arguments are required: scope')
+    if arguments.goal not in list_options + serve_options + variables_options and \
+            (arguments.scope is None or arguments.name is None):
+        parser.error('the following arguments are required: scope, name')
     run(arguments)
 
 
@@ -0,0 +1,187 @@
+import hashlib
+import os
+
+from generoo import utils
+from generoo.bundle import read_bytes, file_size
+from generoo.profiling import profiler
+from generoo.streaming import default_chunk_size
+from generoo.utils import render_template, overwrite_file, copy_file, write_chunks, stream_template, template_scan, \
+    load_yaml, dump_yaml
+
+manifest_filename = 'output-manifest.yml'
+statuses = ['created', 'changed', 'skipped', 'orphaned']
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_chunks(chunks, entry: dict):
+    """Passes the chunks of text through, storing the SHA-1 of all of them as the output of the entry at the end."""
+    content_hash = hashlib.sha1()
+    for chunk in chunks:
+        content_hash.update(chunk.encode('utf-8'))
+        yield chunk
+    entry['output'] = content_hash.hexdigest()
+
+
+def hash_file(file: str):
+    """Returns the SHA-1 of the file's content, read in chunks, or None if the file cannot be read."""
+    content_hash = hashlib.sha1()
+    try:
+        with open(file, 'rb') as f:
+            chunk = f.read(default_chunk_size)
+            while chunk:
+                content_hash.update(chunk)
+                profiler.count(read=len(chunk))
+                chunk = f.read(default_chunk_size)
+    except OSError:
+        return None
+    return content_hash.hexdigest()
+
+
+def hash_run_configuration(run_configuration: dict) -> str:
+    return hash_bytes(dump_yaml(run_configuration, sort_keys=True).encode('utf-8'))
+
+
+class OutputManifest:
+    """
+    Records, for every file generated into a project, the hash of the template it was rendered from, the hash of the run
+    configuration it was rendered with and the hash of the output that was written. The manifest is kept in the
+    .generoo directory next to the run configuration.
+
+    When a project is generated again, a file whose template and run configuration still match the manifest is skipped
+    without rendering, including a file that was edited since it was generated; only a file that went missing is
+    generated again. A file whose rendered output matches what is already on disk is not written again either, so
+    regenerating a project only touches the files that actually change.
+    """
+
+    def __init__(self, project: str, run_configuration: dict):
+        self.project = project
+        self.configuration_hash = hash_run_configuration(run_configuration)
+        self.previous = {}
+        self.entries = {}
+        self.statuses = {}
+
+    def path(self) -> str:
+        return os.path.join(self.project, '.generoo', manifest_filename)
+
+    def load(self):
+        """Loads the manifest of the previous generation, if there is one."""
+        try:
+            with open(self.path()) as f:
+                self.previous = load_yaml(f.read()) or {}
+        except IOError:
+            self.previous = {}
+        return self
+
+    def save(self, writer=None):
+        content = dump_yaml(self.entries, indent=4, sort_keys=True)
+        if writer is not None:
+            writer.write(self.path(), content)
+        else:
+            overwrite_file(self.path(), content)
+
+    def fill(self, destination: str, template: str, parameters: dict, copy_mode: str = 'copy', writer=None):
+        """
+        Renders the template to the destination unless it is unchanged since the previous generation. Templates without
+        tags are copied instead of rendered, see copy_file.
+
+        Hashes are always compared against the destination on disk; a directory writer only decides where the changed
+        files are staged until they are committed. Templates that are streamed are only hashed as they are written, so
+        they are written whenever their inputs changed, even when their output turns out to be the same.
+
+        :param destination:
+        :param template:
+        :param parameters:
+        :param copy_mode:
+        :param writer:
+        :return:
+        """
+        key = os.path.relpath(destination, self.project)
+        template_hash, tag_free = template_scan.scan(template)
+        output_hash = hash_file(destination)
+
+        previous = self.previous.get(key)
+        if previous and previous['template'] == template_hash \
+                and previous['configuration'] == self.configuration_hash and output_hash is not None:
+            # An output that differs from the recorded one was edited by hand, and is kept as it is.
+            self.record(key, previous, 'skipped')
+            return
+
+        if not tag_free and file_size(template) >= utils.stream_threshold:
+            self.stream(key, destination, template, parameters, template_hash, output_hash, writer)
+            return
+        if tag_free:
+            content = None
+            rendered_hash = template_hash
+        else:
+            # Line endings are translated as when the template is read in text mode, see render_template_to_directory.
+            raw = read_bytes(template).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            content = render_template(raw, parameters).encode('utf-8')
+            rendered_hash = hash_bytes(content)
+        if output_hash == rendered_hash:
+            status = 'skipped'
+        else:
+            if writer is not None:
+                if content is None:
+                    writer.copy(template, destination, copy_mode)
+                else:
+                    writer.write(destination, content)
+            elif content is None:
+                copy_file(template, destination, copy_mode)
+            else:
+                overwrite_file(destination, content)
+            status = 'created' if output_hash is None else 'changed'
+        self.record(key, {'template': template_hash, 'configuration': self.configuration_hash,
+                          'output': rendered_hash}, status)
+
+    def stream(self, key: str, destination: str, template: str, parameters: dict, template_hash: str, output_hash: str,
+               writer=None):
+        """
+        Renders a template that is streamed, see stream_template, and hashes its output as it is written. Its entry gets
+        the hash of the output once the last chunk is written, which for a recording writer is when it is replayed.
+        """
+        entry = {'template': template_hash, 'configuration': self.configuration_hash, 'output': None}
+        chunks = hash_chunks(stream_template(template, parameters), entry)
+        if writer is not None:
+            writer.write_chunks(destination, chunks)
+        else:
+            write_chunks(destination, chunks)
+        self.record(key, entry, 'created' if output_hash is None else 'changed')
+
+    def resume(self):
+        """Keeps the entries of the previous generation, when only some of the files of the project are generated."""
+        self.entries = dict(self.previous)
+        return self
+
+    def forget(self, destination: str):
+        """Removes the entry of a file that is no longer generated."""
+        key = os.path.relpath(destination, self.project)
+        self.entries.pop(key, None)
+        self.statuses.pop(key, None)
+
+    def record(self, key: str, entry: dict, status: str):
+        self.entries[key] = entry
+        self.statuses[key] = status
+
+    def orphans(self) -> list:
+        """Files recorded by the previous generation that this generation did not produce."""
+        return sorted(key for key in self.previous if key not in self.entries)
+
+    def counts(self) -> dict:
+        """The number of files of every status, see statuses."""
+        counts = {status: 0 for status in statuses}
+        for status in self.statuses.values():
+            counts[status] += 1
+        counts['orphaned'] = len(self.orphans())
+        return counts
+
+    def report(self, log=print):
+        """Reports the number of files of every status, and every orphaned file, to log, or nowhere when it is None."""
+        if log is None:
+            return
+        counts = self.counts()
+        log(', '.join(f'{status.capitalize()}: {counts[status]}' for status in statuses))
+        for orphan in self.orphans():
+            log(f'Orphaned: {os.path.join(self.project, orphan)}')
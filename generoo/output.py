@@ -0,0 +1,381 @@
+import errno
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+from generoo.bundle import find_bundle, file_size
+from generoo.profiling import profiler
+from generoo.utils import overwrite_file, copy_file, write_chunks
+
+tar_modes = [
+    ('.tar.gz', 'w:gz'),
+    ('.tgz', 'w:gz'),
+    ('.tar.bz2', 'w:bz2'),
+    ('.tar.xz', 'w:xz'),
+    ('.tar', 'w'),
+]
+
+
+def archive_name(path: str) -> str:
+    """Normalizes a destination path into an archive entry name, e.g. example/./pom.xml to example/pom.xml."""
+    name = os.path.normpath(path).replace(os.sep, '/').lstrip('/')
+    if name == '..' or name.startswith('../'):
+        raise AttributeError(f'{path} is outside of the project and cannot be written to an archive.')
+    return name
+
+
+class ArchiveWriter:
+    """
+    Streams generated files into a tar or zip archive instead of writing them to disk. The format follows the extension
+    of the target; `-` streams a gzipped tar to stdout. When a file object is given, the archive is written to it and the
+    target only names the format.
+
+    Every entry gets the time the archive was opened as its modification time, or SOURCE_DATE_EPOCH when it is set so
+    that archives can be reproduced.
+    """
+
+    def __init__(self, target: str, fileobj=None):
+        self.target = target
+        self.lock = threading.Lock()
+        self.mtime = int(os.environ.get('SOURCE_DATE_EPOCH') or time.time())
+        self.tar = None
+        self.zip = None
+        if target == '-':
+            self.tar = tarfile.open(fileobj=sys.__stdout__.buffer, mode='w|gz')
+        elif target.endswith('.zip'):
+            self.zip = zipfile.ZipFile(fileobj or target, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            mode = next((mode for suffix, mode in tar_modes if target.endswith(suffix)), None)
+            if mode is None:
+                raise AttributeError(f'Unsupported archive format for {target}. '
+                                     f'Use one of {", ".join(suffix for suffix, _ in tar_modes)}, .zip or -.')
+            self.tar = tarfile.open(target, mode, fileobj=fileobj)
+
+    def write(self, path: str, content):
+        """
+        Adds a file with the given content, str or bytes, to the archive.
+
+        :param path:
+        :param content:
+        :return:
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self.add(archive_name(path), 0o644, len(content), io.BytesIO(content))
+
+    def write_chunks(self, path: str, chunks):
+        """
+        Adds a file whose content is produced in chunks of text. Tar entries need their size up front, so the chunks are
+        spooled to a temporary file first instead of being held in memory.
+
+        :param path:
+        :param chunks:
+        :return:
+        """
+        with tempfile.TemporaryFile() as spool:
+            for chunk in chunks:
+                spool.write(chunk.encode('utf-8'))
+            size = spool.tell()
+            spool.seek(0)
+            self.add(archive_name(path), 0o644, size, spool)
+
+    def copy(self, source: str, path: str, copy_mode: str = 'copy'):
+        """
+        Adds a file to the archive straight from the source file, keeping its permissions. The copy mode only applies to
+        files written to disk.
+
+        :param source:
+        :param path:
+        :param copy_mode:
+        :return:
+        """
+        bundle, relative = find_bundle(source)
+        if bundle is not None:
+            content = bundle.view(relative)
+            self.add(archive_name(path), bundle.mode(relative), len(content), io.BytesIO(content))
+            return
+        stat = os.stat(source)
+        profiler.count(read=stat.st_size)
+        with open(source, 'rb') as f:
+            self.add(archive_name(path), stat.st_mode & 0o777, stat.st_size, f)
+
+    def add(self, name: str, mode: int, size: int, fileobj):
+        profiler.count(written=size)
+        with self.lock:
+            if self.tar is not None:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mode = mode
+                info.mtime = self.mtime
+                self.tar.addfile(info, fileobj)
+            else:
+                info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+                info.external_attr = (0o100000 | mode) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with self.zip.open(info, 'w') as entry:
+                    chunk = fileobj.read(1024 * 1024)
+                    while chunk:
+                        entry.write(chunk)
+                        chunk = fileobj.read(1024 * 1024)
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+        else:
+            self.zip.close()
+        if self.target == '-':
+            sys.__stdout__.buffer.flush()
+
+
+class DirectoryWriter:
+    """
+    Writes a generated project to disk atomically.
+
+    Files of the project are first written to a staging directory next to it, named after the project with a unique
+    suffix, so concurrent generations into the same parent directory never share one. Commit then moves the staging
+    directory into place with a single rename for a new project, or replaces the staged files one by one, each with a
+    rename, for an existing project. Files outside of the project, from mappings, are written next to their destination
+    and renamed at commit as well. Abort removes everything that was staged, so a failed generation leaves the project
+    as it was. A commit that fails partway, e.g. on a full disk, puts back the files it already replaced before aborting,
+    see rollback.
+
+    Directories are created once and remembered, instead of once per file. With fsync, every staged file is synced in
+    one batch before anything is renamed.
+    """
+
+    def __init__(self, project: str, fsync: bool = False):
+        self.project = os.path.normpath(project)
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.staging = None
+        self.directories = set()
+        self.staged = []
+        self.outside = []
+
+    def staging_directory(self) -> str:
+        with self.lock:
+            if self.staging is None:
+                parent = os.path.dirname(os.path.abspath(self.project))
+                os.makedirs(parent, exist_ok=True)
+                self.staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(self.project)}.', suffix='.generoo',
+                                                dir=parent)
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(self.staging, 0o777 & ~umask)
+                self.directories.add(self.staging)
+            return self.staging
+
+    def temporary_path(self, path: str) -> str:
+        """Resolves where a file is written until commit."""
+        relative = os.path.relpath(path, self.project)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+            temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.generoo'
+            with self.lock:
+                self.outside.append((temporary, path))
+        else:
+            temporary = os.path.join(self.staging_directory(), relative)
+            with self.lock:
+                self.staged.append(temporary)
+        self.ensure_directory(os.path.dirname(temporary))
+        return temporary
+
+    def ensure_directory(self, directory: str):
+        if directory == '' or directory in self.directories:
+            return
+        os.makedirs(directory, exist_ok=True)
+        while directory and directory not in self.directories:
+            self.directories.add(directory)
+            directory = os.path.dirname(directory)
+
+    def write(self, path: str, content):
+        overwrite_file(self.temporary_path(path), content, make_directories=False)
+
+    def write_chunks(self, path: str, chunks):
+        write_chunks(self.temporary_path(path), chunks, make_directories=False)
+
+    def copy(self, source: str, path: str, copy_mode: str = 'copy'):
+        copy_file(source, self.temporary_path(path), copy_mode, make_directories=False)
+
+    def close(self):
+        self.commit()
+
+    def commit(self):
+        if self.fsync:
+            for temporary in self.staged + [temporary for temporary, _ in self.outside]:
+                sync(temporary)
+        replaced = []
+        backup = None
+        try:
+            for temporary, path in self.outside:
+                backup = self.replace(temporary, path, replaced, backup)
+            if self.staging is not None:
+                if self.rename_project():
+                    replaced.append((self.project, None))
+                    self.staging = None
+                else:
+                    self.directories = set()
+                    staging_len = len(self.staging) + 1
+                    for temporary in self.staged:
+                        path = os.path.join(self.project, temporary[staging_len:])
+                        self.ensure_directory(os.path.dirname(path))
+                        backup = self.replace(temporary, path, replaced, backup)
+                    shutil.rmtree(self.staging, ignore_errors=True)
+                    self.staging = None
+                if self.fsync:
+                    sync(os.path.dirname(os.path.abspath(self.project)))
+        except BaseException:
+            rollback(replaced)
+            self.abort()
+            raise
+        finally:
+            if backup is not None:
+                shutil.rmtree(backup, ignore_errors=True)
+        self.staged = []
+        self.outside = []
+
+    def rename_project(self) -> bool:
+        """
+        Renames the staging directory into place as the project, unless a project exists, which is told by the rename
+        failing rather than by looking first, so that a project created in the meantime is never renamed over.
+        """
+        try:
+            os.rename(self.staging, self.project)
+        except (FileExistsError, NotADirectoryError):
+            return False
+        except OSError as e:
+            if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                return False
+            raise
+        return True
+
+    def replace(self, temporary: str, path: str, replaced: list, backup: str) -> str:
+        """
+        Renames the temporary file over its destination, keeping a hard link to the file it replaces in the backup
+        directory, which is made on first use and returned, until the commit is done. Whether there is a file to keep
+        is told by linking it, not by looking first, so that a file created in the meantime is kept as well.
+        """
+        if backup is None:
+            backup = tempfile.mkdtemp(prefix=f'.{os.path.basename(self.project)}.', suffix='.backup',
+                                      dir=os.path.dirname(os.path.abspath(self.project)))
+        previous = os.path.join(backup, str(len(replaced)))
+        try:
+            os.link(path, previous, follow_symlinks=False)
+        except FileNotFoundError:
+            previous = None
+        except OSError:
+            # Without hard links the file is moved aside, leaving its destination missing until the rename below.
+            try:
+                os.rename(path, previous)
+            except FileNotFoundError:
+                previous = None
+        os.replace(temporary, path)
+        replaced.append((path, previous))
+        return backup
+
+    def abort(self):
+        for temporary, _ in self.outside:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+        self.staging = None
+        self.staged = []
+        self.outside = []
+
+
+def rollback(replaced: list):
+    """Undoes the renames of a failed commit, latest first, putting back the files they replaced."""
+    for path, previous in reversed(replaced):
+        try:
+            if previous is not None:
+                os.replace(previous, path)
+            else:
+                remove(path)
+        except OSError:
+            pass
+
+
+def remove(path: str):
+    """Removes a file, or the project directory renamed into place, which os.remove refuses."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        shutil.rmtree(path)
+
+
+def sync(path: str):
+    """Flushes a file or directory to disk. Directories cannot be opened on every platform, which is ignored."""
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class FileWriter:
+    """Writes files straight to their destination, for generations without a directory or archive writer."""
+
+    def write(self, path: str, content):
+        overwrite_file(path, content)
+
+    def write_chunks(self, path: str, chunks):
+        write_chunks(path, chunks)
+
+    def copy(self, source: str, path: str, copy_mode: str = 'copy'):
+        copy_file(source, path, copy_mode)
+
+
+class RecordingWriter:
+    """
+    Records the files a render job writes, so that rendering and writing can happen on different threads and files are
+    written in the order they were collected. Templates without tags are recorded by their path and only read when the
+    recording is replayed, and so are the chunks of streamed templates, which are only rendered as they are written, so
+    their contents are never held in memory.
+
+    The number of files and bytes the recording writes are counted as it is recorded, or as it is replayed for streamed
+    templates.
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.size = 0
+
+    def write(self, path: str, content):
+        self.operations.append((path, content, None, None))
+        self.size += len(content) if isinstance(content, bytes) else len(content.encode('utf-8'))
+
+    def write_chunks(self, path: str, chunks):
+        self.operations.append((path, self.counted(chunks), None, None))
+
+    def counted(self, chunks):
+        for chunk in chunks:
+            self.size += len(chunk.encode('utf-8'))
+            yield chunk
+
+    def copy(self, source: str, path: str, copy_mode: str = 'copy'):
+        self.operations.append((path, None, source, copy_mode))
+        self.size += file_size(source)
+
+    def replay(self, writer):
+        for path, content, source, copy_mode in self.operations:
+            if source is None and isinstance(content, (str, bytes)):
+                writer.write(path, content)
+            elif source is None:
+                writer.write_chunks(path, content)
+            else:
+                writer.copy(source, path, copy_mode)
@@ -0,0 +1,61 @@
+import queue
+import threading
+
+default_depth_per_worker = 4
+
+
+def run_pipeline(jobs, render, write, workers: int = 1, depth: int = None):
+    """
+    Runs every job through render and then write, in the order the jobs are produced.
+
+    With one worker each job is rendered and written in turn. With more, the pipeline has three stages connected by
+    bounded queues: the calling thread pulls jobs from the iterable, a pool of workers renders them and a single writer
+    thread writes the results in order. Reading and planning the next jobs, rendering and writing all overlap, and at most
+    depth rendered results wait for the writer at any time, so memory does not grow with the number of jobs.
+
+    render must not raise; failures are expected to be part of its result. An error raised by write stops the pipeline
+    and is raised once the workers are done.
+
+    :param jobs: an iterable of jobs, which can be a generator planning them lazily.
+    :param render: renders a job on a worker, returns its result.
+    :param write: writes the result of a job on the writer thread, called as write(job, result).
+    :param workers:
+    :param depth: the number of rendered results that can wait for the writer. Defaults to 4 per worker.
+    :return:
+    """
+    if workers <= 1:
+        for job in jobs:
+            write(job, render(job))
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    pending = queue.Queue(maxsize=depth or workers * default_depth_per_worker)
+    errors = []
+
+    def drain():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                # Keep draining so the producer never blocks on a full queue once writing failed.
+                continue
+            job, future = item
+            try:
+                write(job, future.result())
+            except BaseException as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=drain, name='generoo-writer', daemon=True)
+    writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in jobs:
+                if errors:
+                    break
+                pending.put((job, executor.submit(render, job)))
+    finally:
+        pending.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
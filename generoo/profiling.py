@@ -0,0 +1,168 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+profile_formats = ['table', 'json']
+slowest_templates = 20
+
+
+class Profiler:
+    """
+    Collects the wall time of every lifecycle phase, the time and bytes read and written per template, and the peak
+    memory of a generation. Every method returns immediately while the profiler is disabled, so the instrumented code
+    paths cost next to nothing without --profile.
+
+    Phases that run more than once, like fill_in_templates for every project of a batch, are added up. Bytes are counted
+    per thread, so they are attributed to the right template when templates are rendered in parallel.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = None
+        self.elapsed = 0.0
+        self.phases = {}
+        self.templates = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.cprofile = None
+
+    def start(self, cprofile: bool = False):
+        self.enabled = True
+        self.started = time.perf_counter()
+        if cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.started is not None:
+            self.elapsed = time.perf_counter() - self.started
+        self.enabled = False
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                phase = self.phases.setdefault(name, [0.0, 0])
+                phase[0] += seconds
+                phase[1] += 1
+
+    @contextmanager
+    def template(self, template: str):
+        """Times a single template and attributes the bytes the current thread reads and writes meanwhile to it."""
+        if not self.enabled:
+            yield
+            return
+        self.local.counters = counters = [0, 0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.counters = None
+            with self.lock:
+                entry = self.templates.setdefault(template, [0.0, 0, 0])
+                entry[0] += seconds
+                entry[1] += counters[0]
+                entry[2] += counters[1]
+
+    def count(self, read: int = 0, written: int = 0):
+        if not self.enabled:
+            return
+        counters = getattr(self.local, 'counters', None)
+        if counters is not None:
+            counters[0] += read
+            counters[1] += written
+        with self.lock:
+            self.bytes_read += read
+            self.bytes_written += written
+
+    def report(self) -> dict:
+        return {
+            'seconds': self.elapsed,
+            'phases': [{'phase': name, 'seconds': seconds, 'calls': calls}
+                       for name, (seconds, calls) in self.phases.items()],
+            'templates': [{'template': template, 'seconds': seconds, 'bytes_read': read, 'bytes_written': written}
+                          for template, (seconds, read, written)
+                          in sorted(self.templates.items(), key=lambda item: -item[1][0])],
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_memory': peak_memory(),
+        }
+
+    def print_report(self, profile_format: str = 'table', file=None):
+        """
+        Prints the report to stderr, so that it never mixes with the files generoo lists on stdout.
+
+        :param profile_format: table, or json for the full report including every template.
+        :param file:
+        :return:
+        """
+        file = file or sys.stderr
+        report = self.report()
+        if profile_format == 'json':
+            print(json.dumps(report, indent=2), file=file)
+            return
+        print_table([('Phase', 'Calls', 'Seconds')] +
+                    [(phase['phase'], str(phase['calls']), f'{phase["seconds"]:.4f}') for phase in report['phases']],
+                    file)
+        templates = report['templates']
+        if templates:
+            print(file=file)
+            print_table([('Template', 'Seconds', 'Read', 'Written')] +
+                        [(template['template'], f'{template["seconds"]:.4f}', format_bytes(template['bytes_read']),
+                          format_bytes(template['bytes_written'])) for template in templates[:slowest_templates]],
+                        file)
+            if len(templates) > slowest_templates:
+                print(f'... and {len(templates) - slowest_templates} faster templates, see --profile json.', file=file)
+        print(file=file)
+        memory = report['peak_memory']
+        print(f'Total: {report["seconds"]:.4f} s, {len(templates)} templates, '
+              f'read {format_bytes(report["bytes_read"])}, written {format_bytes(report["bytes_written"])}, '
+              f'peak memory {format_bytes(memory) if memory is not None else "unknown"}', file=file)
+
+    def dump_stats(self, file: str):
+        """Writes the cProfile statistics, which only cover the main thread, for pstats or snakeviz."""
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(file)
+
+
+def peak_memory():
+    """The peak resident memory of the process in bytes, or None where the resource module is not available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+def print_table(rows: list, file):
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip(), file=file)
+
+
+profiler = Profiler()
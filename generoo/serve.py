@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+from generoo import version
+from generoo.batch import generate_batch_project
+from generoo.catalog import catalogs, directory_fingerprint, load_catalog
+from generoo.generoo import archetype_default, template_filename, template_trees, load_template_configuration, \
+    full_scope_name, used_names, GenerationError
+from generoo.output import ArchiveWriter
+from generoo.utils import template_cache, template_scan, configuration_cache, plan_cache, clear_templates
+
+content_types = {
+    'tar.gz': 'application/gzip',
+    'tgz': 'application/gzip',
+    'tar.bz2': 'application/x-bzip2',
+    'tar.xz': 'application/x-xz',
+    'tar': 'application/x-tar',
+    'zip': 'application/zip',
+}
+# Archives are built in memory up to this size and spill to a temporary file beyond it.
+spool_size = 16 * 1024 * 1024
+chunk_size = 1024 * 1024
+
+
+class RequestError(Exception):
+    """Raised when a request is malformed, and answered with 400 Bad Request."""
+
+
+class TemplateStore:
+    """
+    Keeps template configurations loaded and template directories walked between requests.
+
+    Before every request the directories of the template are compared with the state they were walked in, and a template
+    directory in which anything was added, removed or renamed is walked again. A template configuration is loaded again
+    when its size or modification time changed. Template contents need no invalidation: parsed templates are keyed by
+    their content and template scans by their size and modification time. Parsed and compiled templates are kept in
+    memory up to a bound, and dropped when a template directory changes, see clear_templates.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.lock = threading.Lock()
+        self.fingerprints = {}
+        self.configurations = {}
+
+    def resolve(self, request: dict) -> (str, str):
+        """
+        Resolves the template directory and configuration of a request. A server started with --template-config always
+        generates from that configuration; otherwise the request names an archetype under --template, e.g.
+        java/spring-boot/2.0.
+
+        :param request:
+        :return:
+        """
+        if self.args.template_config:
+            template = self.args.template
+            if template is None or template == archetype_default:
+                template = os.path.dirname(self.args.template_config)
+            return template, self.args.template_config
+        archetype = request.get('archetype')
+        if not isinstance(archetype, str) or not archetype:
+            raise RequestError('Missing archetype, e.g. java/spring-boot/2.0.')
+        archetype = os.path.normpath(archetype)
+        if os.path.isabs(archetype) or archetype == os.pardir or archetype.startswith(os.pardir + os.sep):
+            raise RequestError(f'Archetype {archetype} is outside of the archetype directory.')
+        directory = os.path.join(self.args.template, archetype) + os.sep
+        scope = full_scope_name(request.get('scope') or 'project')
+        config = f'{directory}{scope}{template_filename}'
+        if scope is None or not os.path.isfile(config):
+            raise RequestError(f'No {request.get("scope") or "project"} template configuration for {archetype}.')
+        return directory, config
+
+    def load(self, directory: str, config: str) -> dict:
+        with self.lock:
+            fingerprint = directory_fingerprint(directory, excluded=[])
+            if self.fingerprints.get(directory) != fingerprint:
+                template_trees.pop(directory, None)
+                if directory in self.fingerprints:
+                    # Templates were added, removed or renamed, so the ones kept in memory may be gone.
+                    clear_templates()
+                self.fingerprints[directory] = fingerprint
+            stat = os.stat(config)
+            key = (stat.st_size, stat.st_mtime_ns)
+            loaded = self.configurations.get(config)
+            if loaded is None or loaded[0] != key:
+                loaded = (key, load_template_configuration(config))
+                self.configurations[config] = loaded
+            return loaded[1]
+
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    """
+    GET /health answers whether the server is up, GET /archetypes lists the archetype catalog and POST /generate
+    generates a project from a JSON request:
+
+        {"name": "example", "archetype": "java/spring-boot/2.0", "format": "tar.gz",
+         "run_configuration": {"group_id": "tech.armyofone", "artifact_id": "example"}}
+
+    The project is answered as an archive. Prompts missing from the run configuration take their default, as in batch
+    runs.
+    """
+
+    server_version = f'generoo/{version}'
+    timeout = 60
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self.send_json(200, {'status': 'ok', 'version': version})
+        elif path == '/archetypes':
+            catalogs.pop(self.server.args.template, None)
+            self.send_json(200, load_catalog(self.server.args.template, template_cache.enabled)['languages'])
+        else:
+            self.send_json(404, {'error': f'Not found: {path}'})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path != '/generate':
+            self.send_json(404, {'error': f'Not found: {path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            if not isinstance(request, dict):
+                raise RequestError('The request must be a JSON object.')
+            archive, filename, content_type = generate_archive(self.server.args, self.server.store, request)
+        except (RequestError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except (AttributeError, GenerationError) as e:
+            self.send_json(422, {'error': str(e)})
+            return
+        except Exception as e:
+            self.log_error('Failed to generate: %s: %s', type(e).__name__, e)
+            self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        with archive:
+            archive.seek(0, os.SEEK_END)
+            size = archive.tell()
+            archive.seek(0)
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(size))
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+            self.end_headers()
+            shutil.copyfileobj(archive, self.wfile, chunk_size)
+
+    def send_json(self, status: int, body: dict):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self) -> str:
+        # Connections on a Unix socket have no client address.
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+def generate_archive(args: argparse.Namespace, store: TemplateStore, request: dict):
+    """
+    Generates the project of a request into an archive. The archive is complete before anything is sent, so that a
+    failing project can still be answered with an error.
+
+    :param args:
+    :param store:
+    :param request:
+    :return: the archive as a file positioned at its start, its file name and its content type.
+    """
+    name = request.get('name')
+    if not isinstance(name, str) or not name or name in (os.curdir, os.pardir) or os.sep in name or '/' in name:
+        raise RequestError(f'Invalid project name: {name}')
+    archive_format = request.get('format') or 'tar.gz'
+    if archive_format not in content_types:
+        raise RequestError(f'Unsupported archive format {archive_format}. Use one of {", ".join(content_types)}.')
+    run_configuration = request.get('run_configuration') or {}
+    if not isinstance(run_configuration, dict):
+        raise RequestError('The run configuration must be a JSON object.')
+
+    directory, config = store.resolve(request)
+    template_configuration = store.load(directory, config)
+    filename = f'{name}.{archive_format}'
+    archive = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    try:
+        writer = ArchiveWriter(filename, archive)
+        try:
+            generate_batch_project(args, directory, template_configuration, name, run_configuration, writer,
+                                   used_names(directory, template_configuration))
+        finally:
+            writer.close()
+    except BaseException:
+        archive.close()
+        raise
+    return archive, filename, content_types[archive_format]
+
+
+class PooledServerMixIn:
+    """Handles connections on a bounded pool of worker threads instead of a new thread per connection."""
+
+    def start_workers(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+
+
+class GenerationServer(PooledServerMixIn, HTTPServer):
+    pass
+
+
+class UnixGenerationServer(PooledServerMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def serve(args: argparse.Namespace):
+    """
+    Serves generations over HTTP, on --host and --port or on the Unix socket given by --socket, with --workers
+    generations at a time. Templates stay loaded between requests, see TemplateStore.
+
+    :param args:
+    :return:
+    """
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixGenerationServer(args.socket, GenerationHandler)
+        address = args.socket
+    else:
+        server = GenerationServer((args.host, args.port), GenerationHandler)
+        address = f'http://{args.host}:{server.server_address[1]}'
+    # What generations report is of no use to anyone, requests are logged on stderr instead.
+    args.log = None
+    server.args = args
+    server.store = TemplateStore(args)
+    server.start_workers(max(1, args.workers or os.cpu_count() or 1))
+    print(f'generoo {version} serving on {address}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            try:
+                os.remove(args.socket)
+            except OSError:
+                pass
+        clear_templates()
+        template_cache.evict()
+        configuration_cache.evict()
+        plan_cache.evict()
+        template_scan.save()
+        plan_cache.save()
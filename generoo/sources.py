@@ -0,0 +1,141 @@
+import os
+import subprocess
+import tarfile
+import zipfile
+
+from generoo import utils
+from generoo.transformations import untrusted_directories
+
+archive_suffixes = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(archive_suffixes) and os.path.isfile(path)
+
+
+def is_git_repository(path: str) -> bool:
+    """Whether the path is a git working tree or a bare repository."""
+    return os.path.exists(os.path.join(path, '.git')) or \
+        all(os.path.exists(os.path.join(path, name)) for name in ('HEAD', 'objects', 'refs'))
+
+
+def split_source(template: str) -> (str, str):
+    """
+    Splits a template given as REPOSITORY@REF into the git repository and the ref. Returns None twice when the template
+    does not name a ref of a git repository, e.g. an existing directory or file whose name contains an @.
+
+    :param template:
+    :return:
+    """
+    if '@' not in template or os.path.exists(template):
+        return None, None
+    repository, ref = template.rsplit('@', 1)
+    if not ref or not os.path.isdir(repository) or not is_git_repository(repository):
+        return None, None
+    return repository, ref
+
+
+def is_source(template: str) -> bool:
+    """Whether the template is materialized from a git repository or an archive, see materialize_source."""
+    return template is not None and (is_archive(template) or split_source(template)[0] is not None)
+
+
+def materialize_source(template: str) -> str:
+    """
+    Materializes a template given as REPOSITORY@REF, a ref of a local git repository, or as a tar or zip archive into
+    the source cache and returns the template directory, see SourceCache. Repositories are keyed by the commit the ref
+    resolves to and archives by their content hash, so the same revision or archive is only ever extracted once.
+
+    An archive, or repository, whose files all sit in a single top level directory, as in most release tarballs, is
+    materialized with that directory as the template directory. Its transformation plugins only run once allowed, see
+    allow_plugins.
+
+    :param template:
+    :return:
+    """
+    repository, ref = split_source(template)
+    if repository is not None:
+        commit = resolve_commit(repository, ref)
+        key = f'git-{commit}'
+        directory = utils.source_cache.materialize(key, lambda tree: extract_commit(repository, commit, tree))
+    else:
+        content_hash, _ = utils.template_scan.scan(template)
+        key = f'archive-{content_hash}'
+        directory = utils.source_cache.materialize(key, lambda tree: extract_archive(template, tree))
+    directory = top_level_directory(directory)
+    untrusted_directories[os.path.abspath(directory)] = template
+    return directory
+
+
+def resolve_commit(repository: str, ref: str) -> str:
+    result = git(repository, 'rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}')
+    commit = result.stdout.decode('utf-8').strip()
+    if result.returncode != 0 or not commit:
+        raise AttributeError(f'{ref} is not a commit of the git repository {repository}.')
+    return commit
+
+
+def extract_commit(repository: str, commit: str, tree: str):
+    """Extracts the files of the commit with git archive, leaving the working tree and index of the repository alone."""
+    os.makedirs(tree)
+    process = subprocess.Popen(['git', '-C', repository, 'archive', '--format=tar', commit], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode='r|') as archive:
+            extract_tar(archive, tree)
+    except tarfile.TarError as e:
+        raise AttributeError(f'Could not extract {commit} of {repository}: {e}')
+    finally:
+        process.stdout.close()
+        error = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise AttributeError(f'Could not extract {commit} of {repository}: {error.decode("utf-8").strip()}')
+
+
+def extract_archive(path: str, tree: str):
+    os.makedirs(tree)
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                # extract sanitizes member paths; the permissions zip files carry are applied by hand.
+                extracted = archive.extract(member, tree)
+                mode = member.external_attr >> 16 & 0o777
+                if mode and not member.is_dir():
+                    os.chmod(extracted, mode)
+    else:
+        try:
+            with tarfile.open(path) as archive:
+                extract_tar(archive, tree)
+        except tarfile.TarError as e:
+            raise AttributeError(f'Could not extract {path}: {e}')
+
+
+def extract_tar(archive: tarfile.TarFile, tree: str):
+    """Extracts a tar archive, refusing members that would end up outside of the tree."""
+    if hasattr(tarfile, 'data_filter'):
+        archive.extractall(tree, filter='data')
+        return
+    root = os.path.realpath(tree)
+    for member in archive:
+        target = os.path.realpath(os.path.join(root, member.name))
+        linked = os.path.realpath(os.path.join(os.path.dirname(target), member.linkname)) if member.issym() else \
+            os.path.realpath(os.path.join(root, member.linkname)) if member.islnk() else target
+        if not all(path == root or path.startswith(root + os.sep) for path in (target, linked)) or \
+                member.isdev():
+            raise AttributeError(f'Refusing to extract {member.name}, which points outside of the archive.')
+        archive.extract(member, root)
+
+
+def top_level_directory(directory: str) -> str:
+    entries = os.listdir(directory)
+    if len(entries) == 1 and os.path.isdir(os.path.join(directory, entries[0])):
+        return os.path.join(directory, entries[0])
+    return directory
+
+
+def git(repository: str, *arguments) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(['git', '-C', repository, *arguments], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise AttributeError(f'git is needed to generate from the repository {repository}: {e}')
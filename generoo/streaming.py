@@ -0,0 +1,219 @@
+import codecs
+import io
+import re
+
+from generoo.bundle import find_bundle
+from generoo.engines import Unsupported, resolve, to_string, escape
+from generoo.profiling import profiler
+
+default_delimiters = ('{{', '}}')
+default_chunk_size = 1024 * 1024
+default_stream_threshold = 32 * 1024 * 1024
+non_whitespace = re.compile(r'\S')
+
+
+def tag_pattern(delimiters: tuple):
+    """Matches a tag right after its opening delimiter, the way pystache's parser does."""
+    return re.compile(r"""
+        \s*
+        (?:
+          (?P<change>=) \s* (?P<delims>.+?) \s* = |
+          (?P<raw>{) \s* (?P<raw_name>.+?) \s* } |
+          (?P<tag>[!>&/#^]?) \s* (?P<key>[\s\S]+?)
+        )
+        \s* %s
+    """ % re.escape(delimiters[1]), re.VERBOSE)
+
+
+def blocking_pattern(delimiters: tuple):
+    """
+    Matches a character no tag can continue past once the line it starts on has ended: tag names cannot span lines, and
+    only whitespace, the end of a triple mustache or a change of delimiters and the closing delimiter can follow them.
+    """
+    return re.compile(r'[^\s=}%s]' % re.escape(delimiters[1]))
+
+
+def read_text(template: str, chunk_size: int = default_chunk_size):
+    """
+    Reads a template, or a template in an opened bundle, in chunks of text with line endings translated the way reading
+    a file in text mode does.
+
+    :param template:
+    :param chunk_size:
+    :return:
+    """
+    bundle, relative = find_bundle(template)
+    if bundle is None:
+        with open(template, 'r') as f:
+            chunk = f.read(chunk_size)
+            while chunk:
+                profiler.count(read=len(chunk))
+                yield chunk
+                chunk = f.read(chunk_size)
+        return
+    view = bundle.view(relative)
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    for offset in range(0, len(view), chunk_size):
+        chunk = decoder.decode(view[offset:offset + chunk_size])
+        if chunk:
+            yield chunk
+    chunk = decoder.decode(b'', final=True)
+    if chunk:
+        yield chunk
+
+
+def render_chunks(chunks, parameters: dict, render, chunk_size: int = default_chunk_size):
+    """
+    Renders a template that arrives in chunks of text, yielding its output in chunks as it goes, so that rendering a
+    huge template never holds more than a few chunks of it in memory.
+
+    The template is tokenized incrementally and split into pieces at the end of a line outside of any tag or section,
+    which render exactly as they do as part of the whole template: standalone tags only depend on the line they are on.
+    Tags that cross a chunk boundary are kept until enough of the template has arrived to tell how they end. Sections
+    are rendered whole, so a piece is at least as large as the largest section in it. A piece that follows a change of
+    delimiters starts with a line setting them again.
+
+    The variables of a piece without any other tags are substituted as the piece is tokenized, the way compiled
+    templates look them up, see generoo.engines. Every other piece is rendered with render, see render_once of the
+    render engines.
+
+    :param chunks: an iterable of the text of the template, see read_text.
+    :param parameters: the run configuration.
+    :param render: renders a piece of the template, called as render(piece, parameters).
+    :param chunk_size: the size a piece grows to before it is rendered.
+    :return:
+    """
+    delimiters = default_delimiters
+    pattern = tag_pattern(delimiters)
+    blocking = blocking_pattern(delimiters)
+    delimiters_prefix = ''
+    pending = ''
+    prefix = ''
+    position = 0
+    depth = 0
+    split = 0
+    split_prefix = ''
+    variables = []
+    # The ends of the other tags, which make the piece they are in rendered by render.
+    others = []
+    chunks = iter(chunks)
+    done = False
+    while not done:
+        chunk = next(chunks, None)
+        if chunk is None:
+            done = True
+        else:
+            pending += chunk
+        decided = len(pending) if done else decided_until(pending, blocking)
+        while True:
+            start = pending.find(delimiters[0], position)
+            end = len(pending) - len(delimiters[0]) + 1 if start < 0 else start
+            if depth == 0 and end > position:
+                newline = pending.rfind('\n', position, end)
+                if newline >= 0:
+                    split = newline + 1
+                    split_prefix = delimiters_prefix
+            if start < 0:
+                position = max(position, end)
+                break
+            body = start + len(delimiters[0])
+            if start < decided and name_start(pending, body, decided) >= 0:
+                match = pattern.match(pending, body)
+            else:
+                match = None
+            if match is None and not done:
+                # The tag could still be completed, or matched differently, by text that has not arrived yet.
+                position = start
+                break
+            if match is None:
+                position = start + 1
+                continue
+            position = match.end()
+            if match.group('change'):
+                delimiters = tuple(match.group('delims').split())
+                pattern = tag_pattern(delimiters)
+                blocking = blocking_pattern(delimiters)
+                delimiters_prefix = prefix_for(delimiters)
+                if not done:
+                    decided = decided_until(pending, blocking)
+                others.append(position)
+                continue
+            tag = match.group('tag')
+            if depth == 0 and (tag == '' or tag == '&' or tag is None):
+                variables.append((start, position, match.group('key') or match.group('raw_name'), tag == ''))
+                continue
+            others.append(position)
+            if tag == '#' or tag == '^':
+                depth += 1
+            elif tag == '/' and depth > 0:
+                depth -= 1
+        if split >= chunk_size and not done:
+            yield render_piece(prefix, pending[:split], not others or others[0] > split, variables, parameters, render)
+            pending = pending[split:]
+            position -= split
+            others = [end - split for end in others if end > split]
+            variables = [(start - split, end - split, key, escaped) for start, end, key, escaped in variables
+                         if start >= split]
+            prefix = split_prefix
+            split = 0
+    if pending:
+        yield render_piece(prefix, pending, not others, variables, parameters, render)
+
+
+def name_start(pending: str, body: int, decided: int) -> int:
+    """
+    Returns where the name of the tag whose body starts at body starts, after any whitespace and the brace of a triple
+    mustache or the equals sign of a change of delimiters, or -1 when it does not start before decided.
+    """
+    match = non_whitespace.search(pending, body, decided)
+    if match is not None and match.group() in ('{', '='):
+        match = non_whitespace.search(pending, match.end(), decided)
+    return -1 if match is None else match.start()
+
+
+def decided_until(pending: str, blocking) -> int:
+    """
+    Returns the index of a line break followed by a character matched by blocking, see blocking_pattern. A tag whose
+    name starts before it matches the same way however the template continues.
+    """
+    newline = pending.rfind('\n')
+    while newline >= 0 and blocking.search(pending, newline + 1) is None:
+        newline = pending.rfind('\n', 0, newline)
+    return max(newline, 0)
+
+
+def prefix_for(delimiters: tuple) -> str:
+    if delimiters == default_delimiters:
+        return ''
+    # A standalone tag on a line of its own renders nothing, not even its line break, and leaves the first line of the
+    # piece at the start of a line, where its own standalone tags are.
+    return f'{default_delimiters[0]}={delimiters[0]} {delimiters[1]}={default_delimiters[1]}\n'
+
+
+def render_piece(prefix: str, piece: str, only_variables: bool, variables: list, parameters: dict, render) -> str:
+    if not variables and only_variables and not prefix:
+        return piece
+    if only_variables and not prefix and isinstance(parameters, dict):
+        try:
+            return substitute(piece, variables, parameters)
+        except Unsupported:
+            pass
+    return render(prefix + piece, parameters)
+
+
+def substitute(piece: str, variables: list, parameters: dict) -> str:
+    """Substitutes the variables of a piece that has no other tags, see render_chunks."""
+    stack = (parameters,)
+    parts = []
+    position = 0
+    for start, end, key, escaped in variables:
+        if start >= len(piece):
+            break
+        parts.append(piece[position:start])
+        value = resolve(stack, key)
+        if value.__class__ is not str:
+            value = to_string(value)
+        parts.append(escape(value) if escaped else value)
+        position = end
+    parts.append(piece[position:])
+    return ''.join(parts)
@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import types
+
+from generoo.bundle import find_bundle
+from generoo.utils import convert_to_snake, convert_to_dashes, convert_to_slashes, convert_to_periods, \
+    convert_to_lower_with_spaces, convert_to_camel, convert_to_caps_no_spaces, convert_to_caps_with_spaces
+
+transformations = {}
+# Plugins of bundles and of archetypes materialized from git repositories or archives only run once allowed, see
+# allow_plugins, since they come from wherever the bundle or archetype came from.
+plugins_allowed = False
+# Directories materialized from git repositories or archives, with the template they were materialized from.
+untrusted_directories = {}
+
+
+def register_transformation(name: str, function=None):
+    """
+    Registers a transformation under the given name, which template configurations refer to case insensitively.
+
+    Can be called directly or used as a decorator:
+
+        @register_transformation('REVERSED')
+        def reverse(string):
+            return string[::-1]
+
+    :param name:
+    :param function: takes the prompt's value and returns the transformed value.
+    :return:
+    """
+    def register(transformation):
+        transformations[name.upper()] = transformation
+        return transformation
+    if function is not None:
+        return register(function)
+    return register
+
+
+def get_transformation(transformation_type: str):
+    transformation = transformations.get(transformation_type.upper())
+    if transformation is None:
+        raise AttributeError(f'Did not recognize the transformation type provided: {transformation_type}')
+    return transformation
+
+
+def allow_plugins(allowed: bool = True):
+    """
+    Allows the transformation plugins of bundles and of archetypes materialized from git repositories or archives to
+    run, see --allow-plugins. Plugins of template directories always run.
+
+    :param allowed:
+    :return:
+    """
+    global plugins_allowed
+    plugins_allowed = allowed
+
+
+def load_transformation_plugins(template_configuration: dict, directory: str):
+    """
+    Template configurations can list python files under `transformation_plugins`, relative to the configuration. Each
+    file is executed once and is expected to call register_transformation for the transformations it provides. Plugins
+    of a configuration in a bundle are executed from the bundle.
+
+    Plugins of a bundle, or of a directory in untrusted_directories, are only executed once allowed by allow_plugins.
+
+    :param template_configuration:
+    :param directory: the directory of the template configuration.
+    :return:
+    """
+    for plugin in template_configuration.get('transformation_plugins') or []:
+        path = os.path.join(directory, plugin)
+        bundle, relative = find_bundle(path)
+        if bundle is not None:
+            path = os.path.join(os.path.abspath(bundle.path), relative)
+            source = bundle.path
+        else:
+            path = os.path.abspath(path)
+            source = next((template for untrusted, template in untrusted_directories.items()
+                           if path.startswith(os.path.join(untrusted, ''))), None)
+        if source is not None and not plugins_allowed:
+            raise AttributeError(f'The template configuration runs the transformation plugin {plugin} from {source}. '
+                                 f'Pass --allow-plugins to run it.')
+        module_name = f'generoo_transformation_plugin_{abs(hash(path))}'
+        if module_name in loaded_plugins:
+            continue
+        if bundle is not None:
+            module = types.ModuleType(module_name)
+            module.__file__ = path
+            exec(compile(bundle.read(relative), path, 'exec'), module.__dict__)
+        else:
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        loaded_plugins[module_name] = module
+
+
+def check_transformations(prompts: list):
+    """
+    Resolves the transformation of every prompt and follow up up front, so that an unknown transformation fails when the
+    template configuration is loaded rather than after the user has answered the prompts before it.
+
+    :param prompts:
+    :return:
+    """
+    for prompt in prompts or []:
+        for transformation in prompt.get('transformations') or []:
+            get_transformation(transformation['transformation'])
+        check_transformations(prompt.get('follow_ups'))
+
+
+def declares_transformations(prompts: list) -> bool:
+    """Whether any prompt or follow up declares a transformation."""
+    return any(prompt.get('transformations') or declares_transformations(prompt.get('follow_ups'))
+               for prompt in prompts or [])
+
+
+loaded_plugins = {}
+
+register_transformation('SNAKE', convert_to_snake)
+register_transformation('DASHES', convert_to_dashes)
+register_transformation('SLASHES', convert_to_slashes)
+register_transformation('PERIODS', convert_to_periods)
+register_transformation('LOWER', convert_to_lower_with_spaces)
+register_transformation('CAMEL', convert_to_camel)
+register_transformation('CAPITALIZED', convert_to_caps_no_spaces)
+register_transformation('CAPITALIZED_WITH_SPACES', convert_to_caps_with_spaces)
@@ -0,0 +1,120 @@
+import os
+import re
+
+from generoo import utils
+from generoo.bundle import file_size, read_bytes
+from generoo.engines import referenced_names
+from generoo.streaming import read_text, render_chunks
+
+path_tag = re.compile(r'{{\s*[#^/&{]?\s*([^\s}]+)')
+
+
+class VariableUsage:
+    """
+    The names the templates of a template configuration and their paths refer to. Every name is kept, and the names
+    referred to outside of any section, which have to be in the run configuration, are kept with the templates and paths
+    that refer to them.
+    """
+
+    def __init__(self):
+        self.names = set()
+        self.required = {}
+
+    def add(self, source: str, names, top_level):
+        self.names.update(names)
+        for name in top_level:
+            self.required.setdefault(name, []).append(source)
+
+    def add_path(self, path: str, source: str = None):
+        """Adds the names a destination path, or a file or directory name, refers to, conditions included."""
+        names = {name.split('.')[0] for name in path_tag.findall(path)}
+        self.add(source or path, names, names)
+
+    def add_template(self, template: str):
+        self.add(template, *utils.template_scan.names(template, template_names))
+
+    def add_tree(self, directory):
+        """Adds every name and template of a template tree, see generoo.generoo.TemplateDirectory."""
+        directories, files = directory.list()
+        for subdirectory in directories:
+            self.add_path(subdirectory.name, subdirectory.path)
+            self.add_tree(subdirectory)
+        for file in files:
+            template = os.path.join(directory.path, file)
+            self.add_path(file, template)
+            self.add_template(template)
+
+
+def template_names(template: str) -> (frozenset, frozenset):
+    """
+    Parses a template and returns the names it refers to, and the ones it refers to outside of any section, see
+    generoo.engines.referenced_names. Templates of at least stream_threshold bytes are parsed a piece at a time, see
+    generoo.streaming.render_chunks.
+
+    :param template: the path of the template.
+    :return:
+    """
+    from pystache import parse
+    names = set()
+    top_level = set()
+    if file_size(template) >= utils.stream_threshold:
+        def collect(piece, _):
+            referenced_names(parse(piece), names, top_level)
+            return ''
+        for _ in render_chunks(read_text(template), None, collect):
+            pass
+    else:
+        referenced_names(parse(read_bytes(template).decode('utf-8')), names, top_level)
+    return frozenset(names), frozenset(top_level)
+
+
+def declared_names(template_configuration: dict) -> dict:
+    """
+    Returns every name the template configuration declares, its variables, prompts, follow ups and transformations,
+    with a description of where it comes from.
+
+    :param template_configuration:
+    :return:
+    """
+    declared = {}
+    for variable in template_configuration.get('variables') or []:
+        declared[variable['name']] = 'variable'
+
+    def add_prompts(prompts):
+        for prompt in prompts or []:
+            declared[prompt['name']] = 'prompt'
+            for transformation in prompt.get('transformations') or []:
+                declared[transformation['name']] = f'{transformation["transformation"].upper()} of {prompt["name"]}'
+            add_prompts(prompt.get('follow_ups'))
+    add_prompts(template_configuration.get('prompts'))
+    return declared
+
+
+def print_usage(usage: VariableUsage, template_configuration: dict, template_directory: str):
+    """
+    Prints every name the template configuration declares with how many templates and paths refer to it, then the
+    declared names nothing refers to and the names referred to outside of any section that are not declared, which
+    render empty.
+
+    :param usage:
+    :param template_configuration:
+    :param template_directory: the templates are printed relative to it.
+    :return:
+    """
+    declared = declared_names(template_configuration)
+    rows = [('Name', 'Declared as', 'References')]
+    for name, description in declared.items():
+        references = len(set(usage.required.get(name, ())))
+        rows.append((name, description, str(references) if references or name not in usage.names else 'in sections'))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+    unused = [name for name in declared if name not in usage.names]
+    missing = sorted(name for name in usage.required if name not in declared)
+    print(f'Unused: {", ".join(unused) or "none"}')
+    if not missing:
+        print('Missing: none')
+    for name in missing:
+        sources = sorted({os.path.relpath(source, template_directory) for source in usage.required[name]})
+        print(f'Missing: {name}, referred to by {", ".join(sources[:3])}'
+              f'{f" and {len(sources) - 3} more" if len(sources) > 3 else ""}')
@@ -1,25 +1,35 @@
 import os
 import re
-import regex
-from pystache import Renderer
+import shutil
+from functools import lru_cache
+
+from generoo.bundle import find_bundle, file_size
+from generoo.cache import TemplateCache, TemplateScan, ConfigurationCache, PlanCache, SourceCache
+from generoo.engines import CompiledEngine, PystacheEngine
+from generoo.profiling import profiler
+from generoo.streaming import read_text, render_chunks, default_stream_threshold
+from generoo.validation import compile_validations
 
 yes_no = ['y', 'n']
+copy_modes = ['copy', 'hardlink', 'reflink']
+ficlone = 0x40049409
+word_separators = re.compile(r'[-_./|\s]')
 
 
 def convert_to_snake(string):
-    return re.sub(r'[-./|\s]', '_', cap_sanitized(string)).lower()
+    return str.join('_', split_words(string))
 
 
 def convert_to_dashes(string):
-    return re.sub(r'[._/|\s]', '-', cap_sanitized(string)).lower()
+    return str.join('-', split_words(string))
 
 
 def convert_to_periods(string):
-    return re.sub(r'[-_/|\s]', '.', cap_sanitized(string)).lower()
+    return str.join('.', split_words(string))
 
 
 def convert_to_slashes(string):
-    return re.sub(r'[-_.|\s]', '/', cap_sanitized(string)).lower()
+    return str.join('/', split_words(string))
 
 
 def convert_to_lower_with_spaces(string):
@@ -28,7 +38,7 @@ def convert_to_lower_with_spaces(string):
 
 def convert_to_camel(string):
     all_caps = convert_to_caps_no_spaces(string)
-    return all_caps[0].lower() + all_caps[1:]
+    return all_caps[:1].lower() + all_caps[1:]
 
 
 def convert_to_caps_with_spaces(string):
@@ -42,39 +52,214 @@ def convert_to_caps_no_spaces(string):
 
 
 def extract_words(string):
-    string = convert_to_dashes(string)
-    words = string.split('-')
-    capitalized_words = []
-    for word in words:
-        capitalized_words.append(word.capitalize())
-    return capitalized_words
+    return [word.capitalize() for word in split_words(string)]
 
 
-def cap_sanitized(string: str):
-    index = 0
-    for letter in string:
-        if letter.isupper():
-            if index > 0:
-                string = string[:index] + '|' + letter.lower()
-        index += 1
-    return string
+@lru_cache(maxsize=1024)
+def split_words(string: str) -> tuple:
+    """
+    Splits the string into lower case words on separators and on upper case letters, which every case conversion
+    shares. Each separator character ends a word, so consecutive separators produce empty words.
+
+    :param string:
+    :return:
+    """
+    return tuple(word.lower() for word in word_separators.split(cap_sanitized(string)))
 
 
-def render_template_to_directory(destination: str, template: str, parameters: dict):
-    overwrite_file(destination, renderer.render(open(template, 'r').read(), parameters))
+def cap_sanitized(string: str):
+    """Marks every upper case letter after the first character as the start of a new word."""
+    return str.join('', ['|' + letter.lower() if letter.isupper() and index > 0 else letter
+                         for index, letter in enumerate(string)])
+
+
+def render_template_to_directory(destination: str, template: str, parameters: dict, copy_mode: str = 'copy',
+                                 writer=None):
+    _, tag_free = template_scan.scan(template)
+    if tag_free:
+        if writer is None:
+            copy_file(template, destination, copy_mode)
+        else:
+            writer.copy(template, destination, copy_mode)
+        return
+    if file_size(template) >= stream_threshold:
+        if writer is None:
+            write_chunks(destination, stream_template(template, parameters))
+        else:
+            writer.write_chunks(destination, stream_template(template, parameters))
+        return
+    bundle, relative = find_bundle(template)
+    if bundle is None:
+        with open(template, 'r') as f:
+            content = f.read()
+        profiler.count(read=len(content))
+    else:
+        # Reading in text mode translates line endings, and so does reading from a bundle.
+        content = bundle.read(relative).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    if writer is None:
+        overwrite_file(destination, render_template(content, parameters))
+    else:
+        writer.write(destination, render_template(content, parameters))
+
+
+def render_template(template: str, parameters: dict) -> str:
+    return render_engine.render(template, parameters)
 
 
 def render_destination_path(destination: str, parameters: dict) -> str:
-    return renderer.render(destination, parameters)
+    return render_engine.render(destination, parameters)
+
+
+def stream_template(template: str, parameters: dict):
+    """
+    Renders a template file piece by piece as the returned iterable is consumed, holding only a few pieces of it in
+    memory at a time, see generoo.streaming.render_chunks. Used instead of render_template for templates of at least
+    stream_threshold bytes.
+
+    :param template: the path of the template.
+    :param parameters:
+    :return:
+    """
+    return render_chunks(read_text(template), parameters, render_engine.render_once)
 
 
-def overwrite_file(file, content):
+def overwrite_file(file, content, make_directories: bool = True):
     directory_name = os.path.dirname(file)
-    if directory_name != '':
+    if make_directories and directory_name != '':
         os.makedirs(directory_name, exist_ok=True)
-    f = open(file, 'w')
+    f = open(file, 'wb' if isinstance(content, bytes) else 'w')
     f.write(content)
     f.close()
+    if profiler.enabled:
+        profiler.count(written=len(content) if isinstance(content, bytes) else len(content.encode('utf-8')))
+
+
+def write_chunks(file, chunks, make_directories: bool = True):
+    """Writes the chunks of text to the file as they are produced, see stream_template."""
+    directory_name = os.path.dirname(file)
+    if make_directories and directory_name != '':
+        os.makedirs(directory_name, exist_ok=True)
+    with open(file, 'w') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            if profiler.enabled:
+                profiler.count(written=len(chunk.encode('utf-8')))
+
+
+def copy_file(source: str, destination: str, copy_mode: str = 'copy', make_directories: bool = True):
+    """
+    Copies a template without tags to its destination without reading it into Python, keeping its permissions.
+
+    The hardlink and reflink modes share the data of the template instead of copying it and fall back to a copy when
+    the filesystem does not support them. Note that a hardlinked output is the template itself, so editing one edits
+    the other.
+
+    :param source:
+    :param destination:
+    :param copy_mode: one of copy, hardlink or reflink.
+    :param make_directories: whether the directory of the destination still needs to be created.
+    :return:
+    """
+    directory_name = os.path.dirname(destination)
+    if make_directories and directory_name != '':
+        os.makedirs(directory_name, exist_ok=True)
+    bundle, relative = find_bundle(source)
+    if bundle is not None:
+        # Templates in a bundle have no file of their own to link to, so they are always written out.
+        content = bundle.view(relative)
+        with open(destination, 'wb') as destination_file:
+            destination_file.write(content)
+        os.chmod(destination, bundle.mode(relative))
+        profiler.count(written=len(content))
+        return
+    if copy_mode == 'hardlink':
+        try:
+            if os.path.lexists(destination):
+                os.remove(destination)
+            os.link(source, destination)
+            return
+        except OSError:
+            pass
+    with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+        if copy_mode != 'reflink' or not reflink(source_file, destination_file):
+            copy_file_contents(source_file, destination_file)
+    shutil.copymode(source, destination)
+    if profiler.enabled:
+        size = os.path.getsize(source)
+        profiler.count(read=size, written=size)
+
+
+def reflink(source_file, destination_file) -> bool:
+    """Clones the source into the destination on filesystems that support it (btrfs, xfs). Linux only."""
+    try:
+        import fcntl
+        fcntl.ioctl(destination_file.fileno(), ficlone, source_file.fileno())
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def copy_file_contents(source_file, destination_file):
+    """Copies in the kernel through copy_file_range or sendfile where available."""
+    source, destination = source_file.fileno(), destination_file.fileno()
+    size = os.fstat(source).st_size
+    for kernel_copy in ('copy_file_range', 'sendfile'):
+        copy = getattr(os, kernel_copy, None)
+        if copy is None:
+            continue
+        try:
+            offset = 0
+            while offset < size:
+                if kernel_copy == 'sendfile':
+                    copied = copy(destination, source, offset, size - offset)
+                else:
+                    copied = copy(source, destination, size - offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+            if offset >= size:
+                return
+        except OSError:
+            pass
+        os.lseek(destination, 0, os.SEEK_SET)
+        os.ftruncate(destination, 0)
+    source_file.seek(0)
+    shutil.copyfileobj(source_file, destination_file)
+
+
+def load_yaml(raw: str):
+    """Parses YAML with libyaml's CSafeLoader when PyYAML was built with it, and the pure python loader otherwise."""
+    import yaml
+    return yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+def dump_yaml(value, **options) -> str:
+    """Dumps YAML with libyaml's CSafeDumper when PyYAML was built with it, and the pure python dumper otherwise."""
+    import yaml
+    return yaml.dump(value, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper), **options)
+
+
+def parse_configuration(raw: str, file: str):
+    """
+    Parses the content of a YAML or JSON configuration file. JSON files go through the json module, falling back to the
+    YAML loader for the JSON that only YAML accepts.
+
+    :param raw:
+    :param file:
+    :return:
+    """
+    if file.endswith('.json'):
+        import json
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+    return load_yaml(raw)
+
+
+def load_configuration_file(file: str):
+    with open(file) as f:
+        return parse_configuration(f.read(), file)
 
 
 def handle_prompt(prompt: dict):
@@ -90,7 +275,7 @@ def prompt_user(prompt: dict):
     text = prompt['text']
     default = prompt.get('default')
     options = prompt.get('options')
-    validations = prompt.get('validations')
+    validations = prompt.get('compiled_validations') or compile_validations(prompt.get('validations'))
     type = prompt.get('type')
     text = format_prompt_text(text, default, options)
     input_response = input(text)
@@ -116,22 +301,8 @@ def format_prompt_text(text, default, options):
     return text
 
 
-def get_validation_strings(validations: list) -> str:
-    validation_string = "The following validations must be met to continue: "
-    for validation in validations:
-        evaluation = validation['evaluation']
-        value = validation['value']
-        if evaluation:
-            if equals_ignore_case(evaluation, 'REGEX'):
-                text = f'Must match regular expression: {value}. '
-            elif equals_ignore_case(evaluation, 'GREATER_THAN'):
-                text = f'Must be greater than: {value}. '
-            elif equals_ignore_case(evaluation, 'LESS_THAN'):
-                text = f'Must be less than: {value}. '
-            else:
-                raise AttributeError(f'Invalid evaluation type for validations: {evaluation}')
-            validation_string += text
-    return validation_string[:-1]
+def get_validation_strings(validations) -> str:
+    return compile_validations(validations).description()
 
 
 def yes_no_to_bool(response: str) -> bool:
@@ -140,39 +311,62 @@ def yes_no_to_bool(response: str) -> bool:
     return False
 
 
-def is_valid_input(input_response: str, validations: list) -> bool:
+def is_valid_input(input_response: str, validations) -> bool:
     """
     Will compare for valid input against a user response.
 
     At the moment, using the greater than or less than comparator is only support for integer types.
 
     :param input_response:
-    :param validations:
+    :param validations: a list of validations or its compiled form, see generoo.validation.
     :return:
     """
-    valid = True
-    if validations:
-        for validation in validations:
-            evaluation = validation['evaluation']
-            value = validation['value']
-            if evaluation:
-                if equals_ignore_case(evaluation, 'REGEX'):
-                    valid = regex.match(value, input_response)
-                elif equals_ignore_case(evaluation, 'GREATER_THAN'):
-                    valid = int(input_response) > value
-                elif equals_ignore_case(evaluation, 'LESS_THAN'):
-                    valid = int(input_response) < value
-                elif equals_ignore_case(evaluation, 'BOOL'):
-                    valid = input_response == value
-                else:
-                    raise AttributeError(f'Invalid evaluation type for validations: {evaluation}')
-                if not valid:
-                    return valid
-    return valid
+    if not validations:
+        return True
+    return compile_validations(validations).is_valid(input_response)
 
 
 def equals_ignore_case(candidate: str, target: str):
     return candidate.lower() == target.lower()
 
 
-renderer = Renderer()
+def use_render_engine(name: str):
+    """
+    Selects the engine that renders templates and destination paths, one of generoo.engines.render_engine_names.
+
+    :param name:
+    :return:
+    """
+    global render_engine
+    render_engine = render_engines[name]
+
+
+def clear_templates():
+    """Drops the parsed and compiled templates kept in memory, see MemoryCache."""
+    template_cache.parsed.clear()
+    render_engines['compiled'].clear()
+
+
+def use_stream_threshold(threshold: int):
+    """
+    Sets the size in bytes from which templates are rendered in chunks, see stream_template.
+
+    :param threshold:
+    :return:
+    """
+    global stream_threshold
+    stream_threshold = threshold
+
+
+template_cache = TemplateCache()
+template_scan = TemplateScan()
+configuration_cache = ConfigurationCache()
+plan_cache = PlanCache()
+source_cache = SourceCache()
+pystache_engine = PystacheEngine(template_cache.parse)
+render_engines = {
+    'compiled': CompiledEngine(template_cache.parse, pystache_engine),
+    'pystache': pystache_engine,
+}
+render_engine = render_engines['compiled']
+stream_threshold = default_stream_threshold
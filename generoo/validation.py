@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+
+
+class Validation(ABC):
+    """
+    A single compiled validation or follow up condition. Compiled validations are immutable, so copies of a template
+    configuration share them.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    @abstractmethod
+    def is_valid(self, input_response) -> bool:
+        pass
+
+    @abstractmethod
+    def description(self) -> str:
+        pass
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class RegexValidation(Validation):
+
+    def __init__(self, value):
+        super().__init__(value)
+        import regex
+        try:
+            self.pattern = regex.compile(value)
+        except (regex.error, TypeError) as e:
+            raise AttributeError(f'Invalid regular expression for validations: {value} ({e})')
+
+    def is_valid(self, input_response) -> bool:
+        return self.pattern.match(input_response) is not None
+
+    def description(self) -> str:
+        return f'Must match regular expression: {self.value}.'
+
+
+class GreaterThanValidation(Validation):
+
+    def __init__(self, value):
+        super().__init__(check_bound(value))
+
+    def is_valid(self, input_response) -> bool:
+        try:
+            return int(input_response) > self.value
+        except ValueError:
+            return False
+
+    def description(self) -> str:
+        return f'Must be greater than: {self.value}.'
+
+
+class LessThanValidation(Validation):
+
+    def __init__(self, value):
+        super().__init__(check_bound(value))
+
+    def is_valid(self, input_response) -> bool:
+        try:
+            return int(input_response) < self.value
+        except ValueError:
+            return False
+
+    def description(self) -> str:
+        return f'Must be less than: {self.value}.'
+
+
+class BoolValidation(Validation):
+
+    def is_valid(self, input_response) -> bool:
+        return input_response == self.value
+
+    def description(self) -> str:
+        return f'Must be: {self.value}.'
+
+
+class Validations(Validation):
+    """
+    The compiled form of a list of validations, or of the conditions of a follow up. Input is valid when it passes every
+    validation in the list.
+    """
+
+    def __init__(self, validations: list):
+        super().__init__(validations)
+        self.text = str.join(' ', ['The following validations must be met to continue:'] +
+                             [validation.description() for validation in validations])
+
+    def is_valid(self, input_response) -> bool:
+        for validation in self.value:
+            if not validation.is_valid(input_response):
+                return False
+        return True
+
+    def description(self) -> str:
+        return self.text
+
+    def __bool__(self):
+        return len(self.value) > 0
+
+
+evaluations = {
+    'REGEX': RegexValidation,
+    'GREATER_THAN': GreaterThanValidation,
+    'LESS_THAN': LessThanValidation,
+    'BOOL': BoolValidation,
+}
+
+
+def check_bound(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise AttributeError(f'Invalid bound for validations, must be a number: {value}')
+    return value
+
+
+def compile_validations(validations: list) -> Validations:
+    """
+    Compiles a list of validations, as given in a template configuration, into a Validations object. Validations
+    without an evaluation are ignored.
+
+    :param validations:
+    :return:
+    """
+    if isinstance(validations, Validations):
+        return validations
+    compiled = []
+    for validation in validations or []:
+        evaluation = validation.get('evaluation')
+        if not evaluation:
+            continue
+        validation_type = evaluations.get(evaluation.upper())
+        if validation_type is None:
+            raise AttributeError(f'Invalid evaluation type for validations: {evaluation}')
+        if 'value' not in validation:
+            raise AttributeError(f'Missing value for {evaluation} validation.')
+        compiled.append(validation_type(validation['value']))
+    return Validations(compiled)
+
+
+def compile_prompts(prompts: list):
+    """
+    Compiles the validations of every prompt and the conditions of every follow up, in place, so that a malformed
+    validation fails when the template configuration is loaded and prompts never interpret them again.
+
+    The compiled forms are kept under `compiled_validations` and `compiled_conditions`.
+
+    :param prompts:
+    :return:
+    """
+    for prompt in prompts or []:
+        if not prompt.get('name'):
+            raise AttributeError(f'Every prompt needs a name: {prompt}')
+        prompt['compiled_validations'] = compile_validations(prompt.get('validations'))
+        if 'conditions' in prompt:
+            prompt['compiled_conditions'] = compile_validations(prompt.get('conditions'))
+        compile_prompts(prompt.get('follow_ups'))
@@ -0,0 +1,342 @@
+import argparse
+import copy
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from generoo.batch import default_prompter
+from generoo.bundle import find_bundle, is_template_directory
+from generoo.generoo import get_template_configuration_metadata, get_generoo_config, load_template_configuration, \
+    override_defaults, extract_run_configuration, plan_templates, fill_templates, used_names, template_trees, log, \
+    GenerationError
+from generoo.manifest import OutputManifest
+from generoo.output import DirectoryWriter
+from generoo.utils import template_cache, template_scan, configuration_cache, source_cache
+
+in_modify = 0x2
+in_attrib = 0x4
+in_close_write = 0x8
+in_moved_from = 0x40
+in_moved_to = 0x80
+in_create = 0x100
+in_delete = 0x200
+in_delete_self = 0x400
+in_move_self = 0x800
+in_q_overflow = 0x4000
+in_ignored = 0x8000
+in_isdir = 0x40000000
+in_nonblock = 0o4000
+in_cloexec = 0o2000000
+watch_mask = in_modify | in_attrib | in_close_write | in_moved_from | in_moved_to | in_create | in_delete | \
+    in_delete_self | in_move_self
+structural_mask = in_moved_from | in_moved_to | in_create | in_delete | in_delete_self | in_move_self
+event_header = struct.Struct('iIII')
+# Changes that arrive within this many seconds of each other are handled together, e.g. an editor saving several files.
+settle_time = 0.05
+poll_interval = 0.5
+
+
+class InotifyWatcher:
+    """
+    Watches directories recursively, and single files through their directory, with Linux's inotify. Directories created
+    while watching are watched as well.
+    """
+
+    def __init__(self, roots: list, files: list):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(in_nonblock | in_cloexec)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.roots = roots
+        self.files = files
+        self.noticed = None
+        self.directories = {}
+        for root in roots:
+            self.watch_tree(root)
+        for file in files:
+            self.watch(os.path.dirname(file))
+
+    def watch(self, directory: str):
+        descriptor = self.add_watch(self.fd, os.fsencode(directory), watch_mask)
+        if descriptor >= 0:
+            self.directories[descriptor] = directory
+
+    def watch_tree(self, root: str):
+        for directory, _, _ in os.walk(root):
+            self.watch(directory)
+
+    def changes(self, timeout: float = None) -> (set, bool):
+        """
+        Waits for the next changes and returns the paths that changed and whether anything was added, removed or
+        renamed. The time the first of them was noticed is kept in noticed.
+
+        :param timeout: seconds to wait for a first change, forever when None.
+        :return:
+        """
+        changed = set()
+        structural = False
+        wait = timeout
+        while select.select([self.fd], [], [], wait)[0]:
+            if not changed:
+                self.noticed = time.perf_counter()
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = event_header.unpack_from(data, offset)
+                offset += event_header.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & in_q_overflow:
+                    # Events were lost, so everything is treated as changed.
+                    return set(self.roots) | set(self.files), True
+                directory = self.directories.get(descriptor)
+                if mask & in_ignored:
+                    self.directories.pop(descriptor, None)
+                    continue
+                if directory is None:
+                    continue
+                path = os.path.join(directory, name) if name else directory
+                if not self.is_watched(path):
+                    continue
+                changed.add(path)
+                if mask & structural_mask:
+                    structural = True
+                if mask & (in_create | in_moved_to) and mask & in_isdir:
+                    self.watch_tree(path)
+            if changed:
+                wait = settle_time
+        return changed, structural
+
+    def is_watched(self, path: str) -> bool:
+        return path in self.files or any(path == root or path.startswith(root + os.sep) for root in self.roots)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watches directories recursively, and single files, by comparing their sizes and modification times."""
+
+    def __init__(self, roots: list, files: list, interval: float = poll_interval):
+        self.roots = roots
+        self.files = files
+        self.interval = interval
+        self.noticed = None
+        self.state = self.snapshot()
+
+    def snapshot(self) -> dict:
+        state = {}
+        for root in self.roots:
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    self.stat(os.path.join(directory, name), state)
+        for file in self.files:
+            self.stat(file, state)
+        return state
+
+    @staticmethod
+    def stat(path: str, state: dict):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        state[path] = (stat.st_size, stat.st_mtime_ns, stat.st_mode)
+
+    def changes(self, timeout: float = None) -> (set, bool):
+        """See InotifyWatcher.changes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.snapshot()
+            structural = state.keys() != self.state.keys()
+            changed = {path for path in state.keys() | self.state.keys() if state.get(path) != self.state.get(path)}
+            self.state = state
+            if changed:
+                self.noticed = time.perf_counter()
+                return changed, structural
+            if deadline is not None and time.monotonic() >= deadline:
+                return set(), False
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots: list, files: list, poll: bool = False):
+    """Watches with inotify where it is available and polls otherwise, or when poll is set."""
+    if not poll:
+        try:
+            return InotifyWatcher(roots, files)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, files)
+
+
+class ProjectWatch:
+    """
+    Keeps a generated project up to date with its templates.
+
+    The template configuration, the run configuration saved in the project and the plan of the project, the destination
+    of every template, are kept between changes, and so are parsed and compiled templates. When a template changes, only
+    its outputs are rendered again. When templates are added, removed or renamed the plan is made again, and when the
+    template configuration, the run configuration or the names the templates refer to change, see used_names, every
+    template is rendered again. Outputs are only written when they changed, see OutputManifest, and outputs that are no
+    longer planned, e.g. because a {{#section}} condition of their path no longer holds, are removed.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.template_directory, self.template_file = get_template_configuration_metadata(args)
+        if find_bundle(self.template_directory)[0] is not None:
+            raise AttributeError('Bundles cannot be watched. Point --template to a template directory.')
+        self.run_configuration_file = os.path.abspath(args.run_configuration or
+                                                      os.path.join(args.name, '.generoo', 'run-configuration.yml'))
+        self.template_configuration = None
+        self.run_configuration = None
+        self.used = None
+        self.jobs = {}
+
+    def load(self):
+        """Loads the template configuration and extracts the run configuration from the one saved in the project."""
+        template_configuration = load_template_configuration(self.template_file)
+        used = used_names(self.template_directory, template_configuration)
+        try:
+            saved = get_generoo_config(self.args) or {}
+        except IOError:
+            raise AttributeError(f'No run configuration in {self.run_configuration_file}. '
+                                 f'Generate the project before watching it.')
+        run_configuration = extract_run_configuration(override_defaults(copy.deepcopy(template_configuration), saved),
+                                                      True, default_prompter, used)
+        self.template_configuration = template_configuration
+        self.run_configuration = run_configuration
+        self.used = used
+
+    def plan(self) -> dict:
+        """Plans every template, keyed by its destination."""
+        jobs = plan_templates(self.args, self.template_directory, self.template_configuration, self.run_configuration)
+        return {os.path.normpath(job[1]): job for job in jobs}
+
+    def watched(self) -> (list, list):
+        """The template directories to watch recursively, and single files to watch."""
+        roots = []
+        files = [os.path.abspath(self.template_file), self.run_configuration_file]
+        if is_template_directory(self.template_directory):
+            roots.append(os.path.abspath(self.template_directory))
+        else:
+            files.append(os.path.abspath(self.template_directory))
+        for mapping in self.template_configuration.get('mappings') or []:
+            template = mapping.get('template')
+            if template and is_template_directory(template):
+                roots.append(os.path.abspath(template))
+        return roots, files
+
+    def update(self, changed: set = None, structural: bool = True) -> (int, int):
+        """
+        Renders the outputs affected by the changed paths, every output when changed is None, and removes the outputs
+        that are no longer planned. Returns the number of templates rendered and of outputs removed.
+
+        :param changed: absolute paths of changed templates and configurations.
+        :param structural: whether templates were added, removed or renamed.
+        :return:
+        """
+        configurations = {os.path.abspath(self.template_file), self.run_configuration_file}
+        if changed is None or structural:
+            template_trees.clear()
+        if changed is None or changed & configurations:
+            self.load()
+            changed = None
+        elif used_names(self.template_directory, self.template_configuration) != self.used:
+            # The templates refer to transformations they did not refer to before, or no longer do.
+            self.load()
+            changed = None
+        previous = self.jobs
+        if changed is None or structural:
+            self.jobs = self.plan()
+        jobs = [job for destination, job in self.jobs.items()
+                if changed is None or destination not in previous or previous[destination][0] != job[0]
+                or os.path.abspath(job[0]) in changed]
+        removed = [destination for destination in previous if destination not in self.jobs]
+
+        manifest = OutputManifest(self.args.name, self.run_configuration).load().resume()
+        writer = DirectoryWriter(self.args.name, self.args.fsync)
+        try:
+            fill_templates(self.args, jobs, self.run_configuration, manifest, writer)
+            for destination in removed:
+                manifest.forget(destination)
+            manifest.save(writer)
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            # Whatever failed is rendered again on the next change.
+            self.jobs = previous
+            raise
+        for destination in removed:
+            remove_output(self.args, destination)
+        return len(jobs), len(removed)
+
+
+def remove_output(args: argparse.Namespace, path: str):
+    """Removes an output and the directories of the project it leaves empty, reporting it to args.log."""
+    try:
+        os.remove(path)
+    except OSError:
+        return
+    log(args, f'Removed {path}')
+    project = os.path.abspath(args.name)
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory.startswith(project + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def watch(args: argparse.Namespace):
+    """
+    Brings the project given as the name up to date with its templates, then watches the templates, the template
+    configuration and the saved run configuration and updates the project on every change until interrupted, see
+    ProjectWatch. The time from a change being noticed to the project being updated is reported for every change.
+
+    :param args:
+    :return:
+    """
+    project = ProjectWatch(args)
+    start = time.perf_counter()
+    project.update()
+    print(f'Watching {project.template_directory}, ready in {(time.perf_counter() - start) * 1000:.0f} ms. '
+          f'Press Ctrl+C to stop.')
+    roots, files = project.watched()
+    watcher = open_watcher(roots, files, args.poll)
+    try:
+        while True:
+            changed, structural = watcher.changes()
+            try:
+                rendered, removed = project.update(changed, structural)
+            except (AttributeError, GenerationError, OSError, ValueError) as e:
+                print(f'Failed to update {args.name}: {type(e).__name__}: {e}')
+                continue
+            finally:
+                template_scan.save()
+            print(f'{len(changed)} changed: rendered {rendered} templates, removed {removed} outputs in '
+                  f'{(time.perf_counter() - watcher.noticed) * 1000:.0f} ms')
+            if project.watched() != (roots, files):
+                # The template configuration now maps other template directories.
+                watcher.close()
+                roots, files = project.watched()
+                watcher = open_watcher(roots, files, args.poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        template_cache.evict()
+        configuration_cache.evict()
+        source_cache.evict()
+        template_scan.save()
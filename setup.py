@@ -1,9 +1,13 @@
 import os
+import re
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+with open("generoo/__init__.py", "r") as fh:
+    version = re.search(r'^version = "(.*)"$', fh.read(), re.MULTILINE).group(1)
+
 archetype_filenames = []
 examples_filenames = []
 
@@ -21,7 +25,7 @@ package_data = {"generoo":  archetype_filenames + examples_filenames}
 
 setuptools.setup(
     name="generoo",
-    version="2019.07.24.6",
+    version=version,
     author="Thomas Sickert",
     author_email="thomas.sickert@gmail.com",
     description="Generate code without writing any.",
@@ -0,0 +1,74 @@
+import unittest
+
+from pystache import Renderer, parse
+
+from generoo.engines import CompiledEngine, PystacheEngine, compile_template, seen
+
+cases = [
+    ('escaping', '<p>{{value}}</p>', {'value': '<a href="x?a=1&b=2">it\'s</a>'}),
+    ('triple mustache', '{{{value}}} {{&value}}', {'value': '<b>"bold" & \'quoted\'</b>'}),
+    ('missing', '[{{missing}}] [{{{missing}}}] [{{missing.key}}]', {}),
+    ('none', '[{{value}}] [{{#value}}shown{{/value}}] [{{^value}}hidden{{/value}}]', {'value': None}),
+    ('numbers and booleans', '{{count}} {{ratio}} {{flag}} {{off}}', {'count': 5, 'ratio': 0.5, 'flag': True,
+                                                                      'off': False}),
+    ('sections', '{{#flag}}on {{name}}{{/flag}}{{#off}}off{{/off}}', {'flag': True, 'off': False, 'name': 'x'}),
+    ('section on a string', '{{#name}}[{{.}}]{{/name}}', {'name': 'value'}),
+    ('section on a dict', '{{#person}}{{name}} of {{team}}{{/person}}', {'person': {'name': 'ann'}, 'team': 'core'}),
+    ('nested sections', '{{#outer}}{{#inner}}{{name}}/{{label}}/{{top}} {{/inner}}{{/outer}}',
+     {'outer': {'label': 'o', 'inner': [{'name': 'a'}, {'name': 'b', 'label': 'i'}]}, 'top': 't'}),
+    ('inverted sections', '{{^empty}}e{{/empty}}{{^zero}}z{{/zero}}{{^missing}}m{{/missing}}{{^full}}f{{/full}}',
+     {'empty': [], 'zero': 0, 'full': [1]}),
+    ('inverted inside a section', '{{#items}}{{name}}{{^last}}, {{/last}}{{/items}}',
+     {'items': [{'name': 'a'}, {'name': 'b'}, {'name': 'c', 'last': True}]}),
+    ('dotted names', '{{a.b.c}} {{a.b}} {{a.x.c}} {{#a}}{{b.c}}{{/a}}', {'a': {'b': {'c': '<deep>'}}}),
+    ('lists of strings', '{{#items}}{{.}},{{/items}}', {'items': ['one', '<two>', 'three']}),
+    ('lists of dicts', '{{#people}}{{name}}:{{age}} {{/people}}', {'people': [{'name': 'ann', 'age': 3},
+                                                                              {'name': 'bob'}], 'age': 9}),
+    ('lists of lists', '{{#rows}}[{{#.}}{{.}}{{/.}}]{{/rows}}', {'rows': [[1, 2], [3]]}),
+    ('comments and delimiters', '{{! a comment }}{{=<% %>=}}<% value %> {{value}}<%={{ }}=%> {{value}}',
+     {'value': 'v'}),
+    ('standalone lines', 'start\n{{#flag}}\n  line\n{{/flag}}\n{{^flag}}\nnone\n{{/flag}}\nend\n', {'flag': True}),
+]
+
+
+class CompiledTemplateTest(unittest.TestCase):
+    """Renders templates with the functions of compile_template and with pystache, which must agree."""
+
+    def test_renders_like_pystache(self):
+        renderer = Renderer()
+        for name, template, parameters in cases:
+            with self.subTest(name):
+                self.assertEqual(compile_template(parse(template))(parameters), renderer.render(template, parameters))
+
+
+class CompiledEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = CompiledEngine(lambda template: template, PystacheEngine(lambda template: template))
+
+    def test_compiles_on_the_second_render(self):
+        template = 'Hello {{name}}.'
+        self.assertEqual(self.engine.render(template, {'name': 'a'}), 'Hello a.')
+        self.assertIs(self.engine.functions.get(template), seen)
+        self.assertEqual(self.engine.render(template, {'name': 'b'}), 'Hello b.')
+        self.assertTrue(callable(self.engine.functions.get(template)))
+        self.assertEqual(self.engine.render(template, {'name': 'c'}), 'Hello c.')
+
+    def test_renders_every_case_like_pystache(self):
+        renderer = Renderer()
+        for name, template, parameters in cases:
+            with self.subTest(name):
+                for _ in range(3):
+                    self.assertEqual(self.engine.render(template, parameters), renderer.render(template, parameters))
+
+    def test_falls_back_to_pystache_for_lambdas(self):
+        renderer = Renderer()
+        parameters = {'upper': lambda text: text.upper(), 'greeting': lambda: '<hi>', 'name': 'value'}
+        for template in ('{{#upper}}hi {{name}}{{/upper}}', '[{{greeting}}] [{{{greeting}}}]'):
+            with self.subTest(template):
+                for _ in range(3):
+                    self.assertEqual(self.engine.render(template, parameters), renderer.render(template, parameters))
+
+
+if __name__ == '__main__':
+    unittest.main()
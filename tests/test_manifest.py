@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from generoo.manifest import OutputManifest
+
+templates = {
+    'greeting.txt': b'Hello {{name}}.\n',
+    'farewell.txt': b'Goodbye {{name}}.\n',
+    'windows.txt': b'Line one of {{name}}.\r\nLine two.\r\n',
+}
+
+
+class OutputManifestTest(unittest.TestCase):
+    """Generates a small project through the output manifest, and generates it again after changing its inputs."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.directory.name, 'template')
+        self.project = os.path.join(self.directory.name, 'demo')
+        os.makedirs(self.template)
+        for name, content in templates.items():
+            self.write_template(name, content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_template(self, name: str, content: bytes):
+        path = os.path.join(self.template, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        # Template hashes are cached by size and modification time, which must not collide within a test.
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def output(self, name: str) -> bytes:
+        with open(os.path.join(self.project, name), 'rb') as f:
+            return f.read()
+
+    def generate(self, run_configuration: dict = None) -> dict:
+        run_configuration = run_configuration or {'name': 'demo'}
+        manifest = OutputManifest(self.project, run_configuration).load()
+        for name in sorted(templates):
+            manifest.fill(os.path.join(self.project, name), os.path.join(self.template, name), run_configuration)
+        manifest.save()
+        return manifest.statuses
+
+    def test_creates_every_file_the_first_time(self):
+        self.assertEqual(set(self.generate().values()), {'created'})
+        self.assertEqual(self.output('greeting.txt'), b'Hello demo.\n')
+        self.assertEqual(self.output('windows.txt'), b'Line one of demo.\nLine two.\n')
+
+    def test_skips_unchanged_files(self):
+        self.generate()
+        modified = {name: os.stat(os.path.join(self.project, name)).st_mtime_ns for name in templates}
+        self.assertEqual(set(self.generate().values()), {'skipped'})
+        self.assertEqual(modified, {name: os.stat(os.path.join(self.project, name)).st_mtime_ns for name in templates})
+
+    def test_rewrites_the_output_of_a_changed_template(self):
+        self.generate()
+        self.write_template('farewell.txt', b'Farewell {{name}}.\r\n')
+        statuses = self.generate()
+        self.assertEqual(statuses.pop('farewell.txt'), 'changed')
+        self.assertEqual(set(statuses.values()), {'skipped'})
+        self.assertEqual(self.output('farewell.txt'), b'Farewell demo.\n')
+
+    def test_rewrites_every_output_of_a_changed_run_configuration(self):
+        self.generate()
+        self.assertEqual(set(self.generate({'name': 'other'}).values()), {'changed'})
+        self.assertEqual(self.output('greeting.txt'), b'Hello other.\n')
+
+    def test_leaves_an_edited_output_alone(self):
+        self.generate()
+        with open(os.path.join(self.project, 'greeting.txt'), 'wb') as f:
+            f.write(b'Hello demo, edited by hand.\n')
+        self.assertEqual(set(self.generate().values()), {'skipped'})
+        self.assertEqual(self.output('greeting.txt'), b'Hello demo, edited by hand.\n')
+
+    def test_generates_a_removed_output_again(self):
+        self.generate()
+        os.remove(os.path.join(self.project, 'greeting.txt'))
+        statuses = self.generate()
+        self.assertEqual(statuses.pop('greeting.txt'), 'created')
+        self.assertEqual(set(statuses.values()), {'skipped'})
+        self.assertEqual(self.output('greeting.txt'), b'Hello demo.\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
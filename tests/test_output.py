@@ -0,0 +1,115 @@
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from generoo.output import DirectoryWriter
+
+
+def read_tree(directory: str) -> dict:
+    """The content of every file under the directory, by its path relative to the directory."""
+    tree = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            with open(os.path.join(root, name), 'rb') as f:
+                tree[os.path.relpath(os.path.join(root, name), directory)] = f.read()
+    return tree
+
+
+def failing(function, failures: set):
+    """Wraps function so that the calls whose numbers, counted from 1, are in failures fail as on a full disk."""
+    calls = []
+
+    def call(*args, **kwargs):
+        calls.append(args)
+        if len(calls) in failures:
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        return function(*args, **kwargs)
+    return call
+
+
+class DirectoryWriterTest(unittest.TestCase):
+    """Stages projects with a DirectoryWriter and commits them, completely or not at all."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.parent = self.directory.name
+        self.project = os.path.join(self.parent, 'demo')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_project(self, files: dict):
+        for name, content in files.items():
+            path = os.path.join(self.project, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+    def stage(self, files: dict) -> DirectoryWriter:
+        writer = DirectoryWriter(self.project)
+        for name, content in files.items():
+            writer.write(os.path.join(self.project, name), content)
+        return writer
+
+    def leftovers(self) -> list:
+        return sorted(name for name in os.listdir(self.parent) if name.endswith(('.generoo', '.backup')))
+
+    def test_renames_a_new_project_into_place(self):
+        writer = self.stage({'a.txt': b'a', os.path.join('src', 'b.txt'): b'b'})
+        self.assertFalse(os.path.exists(self.project))
+        writer.commit()
+        self.assertEqual(read_tree(self.project), {'a.txt': b'a', os.path.join('src', 'b.txt'): b'b'})
+        self.assertEqual(self.leftovers(), [])
+
+    def test_replaces_the_files_of_an_existing_project(self):
+        self.create_project({'a.txt': b'old a', 'kept.txt': b'kept', os.path.join('src', 'b.txt'): b'old b'})
+        self.stage({'a.txt': b'new a', os.path.join('src', 'c.txt'): b'new c'}).commit()
+        self.assertEqual(read_tree(self.project), {'a.txt': b'new a', 'kept.txt': b'kept',
+                                                   os.path.join('src', 'b.txt'): b'old b',
+                                                   os.path.join('src', 'c.txt'): b'new c'})
+        self.assertEqual(self.leftovers(), [])
+
+    def test_merges_into_a_project_created_after_staging(self):
+        writer = self.stage({'a.txt': b'new a', 'b.txt': b'new b'})
+        self.create_project({'a.txt': b'old a', 'other.txt': b'other'})
+        writer.commit()
+        self.assertEqual(read_tree(self.project), {'a.txt': b'new a', 'b.txt': b'new b', 'other.txt': b'other'})
+        self.assertEqual(self.leftovers(), [])
+
+    def test_restores_an_existing_project_when_a_commit_fails_partway(self):
+        original = {'a.txt': b'old a', 'b.txt': b'old b', 'c.txt': b'old c', 'kept.txt': b'kept'}
+        self.create_project(original)
+        writer = self.stage({'a.txt': b'new a', 'b.txt': b'new b', 'c.txt': b'new c', 'd.txt': b'new d'})
+        with mock.patch('os.replace', failing(os.replace, {3})):
+            with self.assertRaises(OSError):
+                writer.commit()
+        self.assertEqual(read_tree(self.project), original)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_restores_files_outside_of_the_project_when_a_commit_fails(self):
+        outside = os.path.join(self.parent, 'outside.txt')
+        with open(outside, 'wb') as f:
+            f.write(b'old outside')
+        writer = self.stage({'a.txt': b'a'})
+        writer.write(outside, b'new outside')
+        with mock.patch('os.rename', failing(os.rename, {1})):
+            with self.assertRaises(OSError):
+                writer.commit()
+        with open(outside, 'rb') as f:
+            self.assertEqual(f.read(), b'old outside')
+        self.assertFalse(os.path.exists(self.project))
+        self.assertEqual(sorted(os.listdir(self.parent)), ['outside.txt'])
+
+    def test_abort_leaves_nothing_behind(self):
+        self.create_project({'a.txt': b'old a'})
+        writer = self.stage({'a.txt': b'new a', 'b.txt': b'new b'})
+        writer.write(os.path.join(self.parent, 'outside.txt'), b'outside')
+        writer.abort()
+        self.assertEqual(read_tree(self.project), {'a.txt': b'old a'})
+        self.assertEqual(sorted(os.listdir(self.parent)), ['demo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+archetype = os.path.join(repository, 'generoo', 'archetypes', 'java', 'spring-boot', '2.0')
+template_config = os.path.join(archetype, 'project-template-config.json')
+
+
+class PlanGoalTest(unittest.TestCase):
+    """Runs generoo plan on the shipped spring-boot archetype, without a run configuration."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.environment = dict(os.environ, PYTHONPATH=repository,
+                                GENEROO_CACHE_DIR=os.path.join(self.directory.name, 'cache'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def plan(self, config: str = template_config, name: str = 'demo', cwd: str = None) -> subprocess.CompletedProcess:
+        command = [sys.executable, '-m', 'generoo', 'plan', 'project', name, '-t', archetype, '-c', config]
+        return subprocess.run(command, cwd=cwd or self.directory.name, env=self.environment, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    def test_plans_with_defaults(self):
+        result = self.plan()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertRegex(lines[-1], r'^Planned 24 files in [\d.]+ ms\.$')
+        self.assertIn(f'{os.path.join(archetype, "pom.xml")} -> demo/./pom.xml', lines)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'demo')))
+
+        result = self.plan()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(result.stdout.splitlines()[-1].endswith(', from the plan cache.'))
+
+    def test_shares_plans_between_projects(self):
+        first = self.plan()
+        self.assertEqual(first.returncode, 0, first.stderr)
+        other = os.path.join(self.directory.name, 'other')
+        os.makedirs(other)
+        second = self.plan(name='second', cwd=other)
+        self.assertEqual(second.returncode, 0, second.stderr)
+        self.assertTrue(second.stdout.splitlines()[-1].endswith(', from the plan cache.'))
+
+        def jobs(result, name):
+            return [line.replace(f' -> {name}{os.sep}', ' -> ') for line in result.stdout.splitlines()[:-1]]
+
+        self.assertIn(f'{os.path.join(archetype, "pom.xml")} -> second/./pom.xml', second.stdout.splitlines())
+        self.assertEqual(jobs(first, 'demo'), jobs(second, 'second'))
+
+    def test_reports_missing_path_answers(self):
+        with open(template_config) as f:
+            configuration = json.load(f)
+        for prompt in configuration['prompts']:
+            if prompt['name'] == 'artifact_id':
+                del prompt['default']
+        config = os.path.join(self.directory.name, 'project-template-config.json')
+        with open(config, 'w') as f:
+            json.dump(configuration, f)
+
+        result = self.plan(config)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('without answers to artifact_id', result.stderr)
+        self.assertNotIn('Traceback', result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+import urllib.request
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+archetype = os.path.join(repository, 'generoo', 'archetypes', 'java', 'spring-boot', '2.0')
+
+
+class ServeGoalTest(unittest.TestCase):
+    """Runs generoo serve with a template configuration of its own and no --template."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.directory.name, 'template')
+        shutil.copytree(archetype, self.template)
+        with open(os.path.join(self.template, 'NOTICE.txt'), 'w') as f:
+            f.write('Generated by {{artifact_id}}.\n')
+        environment = dict(os.environ, PYTHONPATH=repository,
+                           GENEROO_CACHE_DIR=os.path.join(self.directory.name, 'cache'))
+        command = [sys.executable, '-m', 'generoo', 'serve', '--port', '0', '--workers', '1',
+                   '-c', os.path.join(self.template, 'project-template-config.json')]
+        self.server = subprocess.Popen(command, cwd=self.directory.name, env=environment, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+        line = self.server.stderr.readline()
+        self.assertIn('serving on ', line)
+        self.address = line.rsplit(' ', 1)[-1].strip()
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.server.stderr.close()
+        self.directory.cleanup()
+
+    def test_generates_from_the_directory_of_the_configuration(self):
+        run_configuration = {'artifact_id': 'demo', 'hibernate': False}
+        body = json.dumps({'name': 'demo', 'run_configuration': run_configuration}).encode('utf-8')
+        request = urllib.request.Request(f'{self.address}/generate', data=body,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            self.assertEqual(response.status, 200)
+            content = response.read()
+
+        with tarfile.open(fileobj=io.BytesIO(content)) as archive:
+            names = [os.path.normpath(name) for name in archive.getnames()]
+            notice = archive.extractfile(os.path.join('demo', 'NOTICE.txt')).read().decode('utf-8')
+        self.assertIn(os.path.join('demo', 'pom.xml'), names)
+        self.assertEqual(notice, 'Generated by demo.\n')
+        self.assertFalse([name for name in names if 'java' + os.sep + 'spring-boot' in name], names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from generoo import utils
+from generoo.streaming import default_stream_threshold, read_text, render_chunks
+
+parameters = {'name': 'demo', 'html': '<b>"x" & y</b>', 'flag': True, 'off': False, 'count': 3,
+              'items': [{'item': 'a'}, {'item': '<b>'}], 'nested': {'key': {'value': 'deep'}}}
+templates = {
+    'variables': 'Hello {{name}}, {{ name }} and {{html}} or {{{html}}} and {{&html}}.\n{{count}} {{missing}}\n',
+    'sections': 'start\n{{#flag}}\n  on {{name}}\n{{/flag}}\n{{^off}}off is {{off}}\n{{/off}}\n'
+                '{{#items}}- {{item}} of {{name}}\n{{/items}}{{#off}}hidden{{/off}}end\n',
+    'dotted names and comments': '{{nested.key.value}} {{#nested}}{{key.value}}{{/nested}}\n{{! a comment }}\n'
+                                 '{{! a comment\nover two lines }}after\n',
+    'delimiter changes': 'before {{name}}\n{{=<% %>=}}\n<% name %> {{name}} <%{html}%>\n'
+                         '<%#flag%>\n<%name%>\n<%/flag%>\n<%={{ }}=%>\nafter {{name}}\n'
+                         '{{=[ ]=}} [name] [={{ }}=] {{name}}\n',
+    'standalone lines': '  {{#flag}}\n    line {{count}}\n  {{/flag}}\n\t{{! comment }}\n{{^flag}}\nnone\n{{/flag}}\n',
+    'unclosed tags': 'a {{ b\nc }} d {{name}} {{ e }\nf {{{ g }} h {{name}}\n',
+}
+
+
+def split(text: str, size: int) -> list:
+    return [text[offset:offset + size] for offset in range(0, len(text), size)]
+
+
+class RenderChunksTest(unittest.TestCase):
+    """Renders templates in chunks that split them everywhere, which must render as the whole template does."""
+
+    def test_renders_like_the_whole_template(self):
+        engine = utils.render_engines['pystache']
+        for name, template in templates.items():
+            expected = engine.render_once(template, parameters)
+            for size in range(1, 12):
+                for chunk_size in (1, 7, 32, len(template)):
+                    with self.subTest(name, size=size, chunk_size=chunk_size):
+                        rendered = render_chunks(split(template, size), parameters, engine.render_once, chunk_size)
+                        self.assertEqual(''.join(rendered), expected)
+
+    def test_renders_a_repeated_template_in_pieces(self):
+        template = ''.join(templates.values()) * 50
+        engine = utils.render_engines['pystache']
+        pieces = list(render_chunks(split(template, 997), parameters, engine.render_once, 4096))
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(''.join(pieces), engine.render_once(template, parameters))
+
+
+class StreamThresholdTest(unittest.TestCase):
+    """Generates a template just above the stream threshold, which is streamed, and one just below it."""
+
+    threshold = 64 * 1024
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        utils.use_stream_threshold(self.threshold)
+
+    def tearDown(self):
+        utils.use_stream_threshold(default_stream_threshold)
+        self.directory.cleanup()
+
+    def generate(self, size: int) -> (str, str):
+        content = ''.join(templates.values())
+        content = (content * (size // len(content) + 1))[:size - 1] + '\n'
+        template = os.path.join(self.directory.name, f'template-{size}.txt')
+        destination = os.path.join(self.directory.name, f'output-{size}.txt')
+        with open(template, 'w') as f:
+            f.write(content)
+        utils.render_template_to_directory(destination, template, parameters)
+        with open(destination) as f:
+            return f.read(), utils.render_template(content, parameters)
+
+    def test_streams_a_template_above_the_threshold(self):
+        rendered, expected = self.generate(self.threshold + 1)
+        self.assertEqual(rendered, expected)
+
+    def test_renders_a_template_below_the_threshold(self):
+        rendered, expected = self.generate(self.threshold - 1)
+        self.assertEqual(rendered, expected)
+
+    def test_reads_text_in_chunks(self):
+        template = os.path.join(self.directory.name, 'template.txt')
+        with open(template, 'wb') as f:
+            f.write(b'one {{name}}\r\ntwo\r\n' * 1000)
+        chunks = list(read_text(template, 4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), 'one {{name}}\ntwo\n' * 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()